@@ -1,5 +1,6 @@
-from .soap import SOAP
+from .soap import SOAP, AverageSOAP
 from .sf import SymmetryFunctions
 from .mbtr import MBTR, LMBTR
+from .containers import Ragged, ByElement
 
-components = [SOAP, SymmetryFunctions, MBTR, LMBTR]
+components = [SOAP, AverageSOAP, SymmetryFunctions, MBTR, LMBTR]
@@ -0,0 +1,413 @@
+"""Benchmarks of all components on synthetic datasets.
+
+The correctness tests do not notice if cscribe (or dscribe) gets slower,
+so this module times each component on synthetic datasets of growing
+size, small molecules and periodic cells, which are generated from a fixed
+seed and need no downloads. For each combination of component, dataset
+and n_jobs, the throughput (atoms per second) and the growth of the peak
+memory during compute (see profile.py) are recorded.
+
+Each measurement runs in a fresh process, so that the peak memory is not
+hidden by earlier runs, and descriptor memoization does not carry over.
+
+Results can be saved as json and compared against a stored baseline:
+
+    python -m cscribe.benchmark --save baseline.json
+    python -m cscribe.benchmark --compare baseline.json
+
+The second command exits with status 1 if any case has become slower,
+or uses more memory, by more than the tolerance (default 20%).
+
+With --input, the speedup of building dscribe systems directly from the
+dataset arrays over going through ase.Atoms (see systems.py) is measured
+instead, by default on 100k small molecules.
+
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cmlkit import Dataset
+
+from .soap import SOAP, AverageSOAP
+from .sf import SymmetryFunctions
+from .mbtr import MBTR, LMBTR
+
+elems = [1, 6, 8]
+
+mbtr_2 = {
+    "start": 0,
+    "stop": 1.5,
+    "num": 50,
+    "geomf": "1/distance",
+    "weightf": {"exp": {"ls": 0.5}},
+    "broadening": 0.02,
+    "acc": 0.001,
+}
+
+sfs = [{"shifted": {"n": 8}}, {"ang": {"eta": 0.05, "zeta": 1.0, "lambd": 1.0}}]
+
+
+def _soap(context):
+    return SOAP(elems, cutoff=4.0, sigma=0.5, n_max=4, l_max=4, context=context)
+
+
+def _soap_average(context):
+    return AverageSOAP(elems, cutoff=4.0, sigma=0.5, n_max=4, l_max=4, context=context)
+
+
+def _sf(context):
+    return SymmetryFunctions(elems, cutoff=5.0, sfs=sfs, context=context)
+
+
+def _sf_flat(context):
+    return SymmetryFunctions(
+        elems, cutoff=5.0, sfs=sfs, stratify=False, context=context
+    )
+
+
+def _mbtr(context):
+    return MBTR(elems, mbtr_2=mbtr_2, norm="l2_each", context=context)
+
+
+def _lmbtr(context):
+    return LMBTR(elems, mbtr_2=mbtr_2, context=context)
+
+
+def _lmbtr_flat(context):
+    return LMBTR(elems, mbtr_2=mbtr_2, stratify=False, context=context)
+
+
+# name -> function(context) returning the component
+cases = {
+    "soap": _soap,
+    "soap_average": _soap_average,
+    "sf": _sf,
+    "sf_flat": _sf_flat,
+    "mbtr": _mbtr,
+    "lmbtr": _lmbtr,
+    "lmbtr_flat": _lmbtr_flat,
+}
+
+
+def molecules(n, seed=0):
+    """Dataset of n small molecules with 3 to 12 atoms of H, C and O.
+
+    Atoms are placed on a randomly jittered grid with 1.2 spacing, so no
+    two atoms are unphysically close.
+
+    """
+    rng = np.random.RandomState(seed)
+
+    z = []
+    r = []
+    for i in range(n):
+        n_atoms = rng.randint(3, 13)
+        z.append(rng.choice(elems, size=n_atoms))
+        r.append(_positions(rng, n_atoms, spacing=1.2))
+
+    return Dataset(z=_objects(z), r=_objects(r), name=f"molecules_{n}")
+
+
+def crystals(n, seed=0):
+    """Dataset of n periodic cubic cells with 4 to 16 atoms of H, C and O."""
+    rng = np.random.RandomState(seed)
+
+    z = []
+    r = []
+    b = []
+    for i in range(n):
+        n_atoms = rng.randint(4, 17)
+        positions = _positions(rng, n_atoms, spacing=1.5)
+        length = positions.max() + 1.5
+
+        z.append(rng.choice(elems, size=n_atoms))
+        r.append(positions)
+        b.append(np.eye(3) * length)
+
+    return Dataset(z=_objects(z), r=_objects(r), b=np.array(b), name=f"crystals_{n}")
+
+
+datasets = {"molecules": molecules, "crystals": crystals}
+
+
+def _positions(rng, n_atoms, spacing):
+    side = int(np.ceil(n_atoms ** (1 / 3)))
+    grid = np.stack(np.unravel_index(np.arange(side ** 3), (side,) * 3), axis=1)
+    sites = rng.choice(len(grid), size=n_atoms, replace=False)
+
+    jitter = rng.uniform(-0.15, 0.15, size=(n_atoms, 3))
+
+    return (grid[sites] + jitter) * spacing
+
+
+def _objects(arrays):
+    result = np.empty(len(arrays), dtype=object)
+    result[:] = arrays
+
+    return result
+
+
+def run(
+    sizes=(100, 1000),
+    n_jobs=(1, 4),
+    names=None,
+    kinds=("molecules", "crystals"),
+    isolate=True,
+):
+    """Run benchmarks.
+
+    Args:
+        sizes: Numbers of systems in the datasets
+        n_jobs: Values of n_jobs to run each case with
+        names: Names of cases to run (see cases), or None for all
+        kinds: Kinds of datasets to run on (see datasets)
+        isolate: Whether to run each measurement in a fresh process, default True
+
+    Returns:
+        List of results, see measure
+
+    """
+    if names is None:
+        names = list(cases.keys())
+
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            for name in names:
+                for jobs in n_jobs:
+                    if isolate:
+                        result = _isolated(measure, name, kind, size, jobs)
+                    else:
+                        result = measure(name, kind, size, jobs)
+
+                    results.append(result)
+
+    return results
+
+
+def measure(name, kind, size, n_jobs):
+    """Compute case name on a dataset of kind and size, and measure it.
+
+    Returns:
+        dict with name, dataset, n_systems, n_atoms, n_jobs, seconds,
+        atoms_per_second and rss (growth of the peak memory in bytes)
+
+    """
+    data = datasets[kind](size)
+    component = cases[name]({"n_jobs": n_jobs, "profile": True})
+
+    start = time.perf_counter()
+    component(data)
+    seconds = time.perf_counter() - start
+
+    n_atoms = int(data.info["total_atoms"])
+
+    return {
+        "name": name,
+        "dataset": kind,
+        "n_systems": size,
+        "n_atoms": n_atoms,
+        "n_jobs": n_jobs,
+        "seconds": seconds,
+        "atoms_per_second": n_atoms / seconds,
+        "rss": component.stats["compute"]["rss"],
+    }
+
+
+def _isolated(function, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(function, *args).result()
+
+
+def input_speedup(n=100000, name="sf", n_jobs=1, isolate=True):
+    """Compare the input settings "arrays" and "ase" on n small molecules.
+
+    Args:
+        n: Number of molecules
+        name: Name of the case to run (see cases)
+        n_jobs: Value of n_jobs
+        isolate: Whether to run each setting in a fresh process, default True,
+            so the second one does not profit from the descriptor set up
+            (and the memory allocated) by the first
+
+    Returns:
+        dict with the seconds for each input setting, split into the
+        conversion of the dataset (atoms) and the whole computation (compute),
+        and the speedup of the whole computation
+
+    """
+    result = {}
+    for setting in ["ase", "arrays"]:
+        if isolate:
+            result[setting] = _isolated(measure_input, name, n, setting, n_jobs)
+        else:
+            result[setting] = measure_input(name, n, setting, n_jobs)
+
+    result["speedup"] = result["ase"]["compute"] / result["arrays"]["compute"]
+
+    return result
+
+
+def measure_input(name, n, setting, n_jobs):
+    """Compute case name on n small molecules with input setting, and measure it.
+
+    Returns:
+        dict with the seconds spent converting the dataset (atoms)
+        and on the whole computation (compute)
+
+    """
+    data = molecules(n)
+    component = cases[name]({"n_jobs": n_jobs, "profile": True, "input": setting})
+    component(data)
+
+    return {
+        "atoms": component.stats["atoms"]["seconds"],
+        "compute": component.stats["compute"]["seconds"],
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Compare results against baseline results.
+
+    Args:
+        results: List of results, see run
+        baseline: List of results, see run
+        tolerance: Allowed relative loss of throughput, and growth of memory
+
+    Returns:
+        List of (result, baseline result, reason) for each regression
+
+    """
+    reference = {_key(b): b for b in baseline}
+
+    regressions = []
+    for result in results:
+        base = reference.get(_key(result))
+        if base is None:
+            continue
+
+        if result["atoms_per_second"] < base["atoms_per_second"] * (1 - tolerance):
+            regressions.append((result, base, "throughput"))
+
+        # small allocations are below the resolution of the peak RSS
+        if result["rss"] > max(base["rss"], 2 ** 20) * (1 + tolerance):
+            regressions.append((result, base, "memory"))
+
+    return regressions
+
+
+def _key(result):
+    return (result["name"], result["dataset"], result["n_systems"], result["n_jobs"])
+
+
+def save(results, path):
+    """Save results, together with the versions used, as json."""
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "cscribe": _version("cscribe"),
+                "dscribe": _version("dscribe"),
+                "python": platform.python_version(),
+                "machine": platform.node(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def _version(package):
+    try:
+        from importlib.metadata import version
+
+        return version(package)
+    except Exception:
+        # not installed, or python < 3.8
+        return None
+
+
+def load(path):
+    """Load results saved with save."""
+    with open(path, "r") as f:
+        return json.load(f)["results"]
+
+
+def report(results):
+    """Table of results, as string."""
+    lines = [
+        f"{'name':<12} {'dataset':<10} {'systems':>8} {'atoms':>8} {'n_jobs':>6} "
+        f"{'seconds':>9} {'atoms/s':>10} {'rss MiB':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['name']:<12} {r['dataset']:<10} {r['n_systems']:>8} "
+            f"{r['n_atoms']:>8} {r['n_jobs']:>6} {r['seconds']:>9.3f} "
+            f"{r['atoms_per_second']:>10.0f} {r['rss'] / 2**20:>8.1f}"
+        )
+
+    return "\n".join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark cscribe components.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--cases", nargs="+", default=None, choices=list(cases))
+    parser.add_argument(
+        "--datasets", nargs="+", default=list(datasets), choices=list(datasets)
+    )
+    parser.add_argument("--save", default=None, help="Save results as json")
+    parser.add_argument("--compare", default=None, help="Baseline json to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--input", action="store_true", help="Measure speedup of input='arrays'"
+    )
+    args = parser.parse_args(args)
+
+    if args.input:
+        for name in args.cases or ["sf", "soap"]:
+            speedup = input_speedup(name=name)
+            print(
+                f"{name}: ase {speedup['ase']['compute']:.2f}s "
+                f"(conversion {speedup['ase']['atoms']:.2f}s), "
+                f"arrays {speedup['arrays']['compute']:.2f}s "
+                f"(conversion {speedup['arrays']['atoms']:.2f}s), "
+                f"speedup {speedup['speedup']:.2f}x"
+            )
+
+        return 0
+
+    results = run(
+        sizes=args.sizes, n_jobs=args.n_jobs, names=args.cases, kinds=args.datasets
+    )
+    print(report(results))
+
+    if args.save is not None:
+        save(results, args.save)
+
+    if args.compare is not None:
+        regressions = compare(results, load(args.compare), tolerance=args.tolerance)
+        for result, base, reason in regressions:
+            print(
+                f"Regression ({reason}) in {'/'.join(str(k) for k in _key(result))}: "
+                f"{base['atoms_per_second']:.0f} -> {result['atoms_per_second']:.0f} "
+                f"atoms/s, {base['rss']} -> {result['rss']} bytes"
+            )
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
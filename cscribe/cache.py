@@ -0,0 +1,219 @@
+"""Persistent on-disk cache for computed representations.
+
+During hyperparameter searches, the same representation is often
+computed on the same dataset many times. This cache stores each result
+under a key derived from the component kind, its config, and the
+geometries of the dataset (z, r, b), so the second call can skip dscribe
+entirely. Hits are loaded memory-mapped.
+
+Each entry is a directory in the cache location, written with storage.save.
+The modification time of the entry directory is updated on each hit, and
+once the total size exceeds max_bytes, the least recently used entries
+are removed.
+
+SystemCache stores results per system instead, so that only systems that
+have not been seen before have to be computed.
+
+"""
+
+import os
+import time
+import shutil
+import uuid
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+from pathlib import Path
+
+from cmlkit import logger
+from cmlkit.engine import compute_hash
+
+from . import storage
+from . import profile
+
+
+class DescriptorCache:
+    """Content-addressed, size-bounded descriptor cache.
+
+    Args:
+        location: Directory in which entries are stored (created if needed)
+        max_bytes: Maximum total size of all entries, in bytes
+
+    """
+
+    def __init__(self, location, max_bytes=2**34):
+        self.location = Path(location)
+        self.max_bytes = max_bytes
+
+        self.location.mkdir(parents=True, exist_ok=True)
+
+    def key(self, kind, config, data, *extra):
+        """Key for the representation kind with config, computed for data."""
+        return compute_hash(kind, config, data.geom_hash, *extra)
+
+    def get(self, key):
+        """Return stored representation (memory-mapped), or None if not stored."""
+        path = self.location / key
+
+        if not (path / "meta.json").is_file():
+            return None
+
+        try:
+            rep = storage.load(path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            logger.error(f"Could not read cache entry {path}; deleting it.")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        _touch(path)
+
+        return rep
+
+    def put(self, key, rep):
+        """Store representation under key, then evict entries if over budget.
+
+        Representations larger than max_bytes on their own are not stored,
+        as they would be evicted right away.
+
+        """
+        path = self.location / key
+
+        n_bytes = profile.nbytes(rep)
+        if n_bytes > self.max_bytes:
+            logger.debug(f"Not caching {key} ({n_bytes} bytes > max_bytes).")
+            return
+
+        # write to a temporary directory first, so other processes never
+        # see incomplete entries
+        tmp = self.location / f".tmp-{key}-{uuid.uuid4().hex}"
+        storage.save(tmp, rep)
+
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # somebody else stored the same entry in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        _touch(path)
+
+        self.evict(keep=path)
+
+    def entries(self):
+        """List of (last used, size, path) of all entries, oldest first."""
+        result = []
+        for path in self.location.iterdir():
+            if path.is_dir() and not path.name.startswith(".tmp-"):
+                try:
+                    result.append((path.stat().st_mtime, storage.size(path), path))
+                except OSError:
+                    # removed concurrently
+                    pass
+
+        return sorted(result, key=lambda e: e[0])
+
+    def size(self):
+        """Total size of the cache, in bytes."""
+        return sum(e[1] for e in self.entries())
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep: Path of an entry that is never removed (the newest), or None
+
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+
+        for _, entry_size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == Path(keep):
+                continue
+
+            shutil.rmtree(path, ignore_errors=True)
+            total -= entry_size
+            logger.debug(f"Evicted cache entry {path.name} ({entry_size} bytes).")
+
+    def clear(self):
+        """Remove all entries."""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _touch(path):
+    now = time.time()
+    try:
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+
+
+class SystemCache:
+    """Per-structure on-disk cache of raw descriptor output.
+
+    Stores the dscribe output of each system separately, keyed by a
+    fingerprint of its geometry, in a sub-directory for each kind and config.
+    This way, a dataset that has grown since the last call only needs the
+    new systems to be computed. Entries are never evicted.
+
+    Args:
+        location: Directory in which entries are stored (created if needed)
+        kind: Component kind
+        config: Component config
+
+    """
+
+    def __init__(self, location, kind, config):
+        self.location = Path(location) / compute_hash(kind, config)
+        self.location.mkdir(parents=True, exist_ok=True)
+
+    def get(self, fingerprint):
+        """Return stored output for fingerprint, or None."""
+        dense = self.location / f"{fingerprint}.npy"
+        sparse = self.location / f"{fingerprint}.npz"
+
+        try:
+            if dense.is_file():
+                return np.load(dense)
+            elif sparse.is_file():
+                return sp.load_npz(sparse)
+        except (OSError, ValueError):
+            logger.error(f"Could not read cache entry {fingerprint}; recomputing.")
+
+        return None
+
+    def put(self, fingerprint, rep):
+        """Store output for fingerprint."""
+        tmp = self.location / f".tmp-{uuid.uuid4().hex}"
+
+        if sp.issparse(rep):
+            sp.save_npz(tmp, rep.tocsr(), compressed=False)
+            os.replace(f"{tmp}.npz", self.location / f"{fingerprint}.npz")
+        else:
+            np.save(f"{tmp}.npy", rep)
+            os.replace(f"{tmp}.npy", self.location / f"{fingerprint}.npy")
+
+
+def fingerprints(data, centers=None):
+    """Fingerprint (hex digest) of the geometry of each system in data.
+
+    If centers (indices of selected atoms in each system) are given,
+    they are included in the fingerprint.
+
+    """
+    result = np.empty(data.n, dtype=object)
+
+    for i in range(data.n):
+        h = hashlib.blake2b(digest_size=20)
+        h.update(np.ascontiguousarray(data.z[i], dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(data.r[i], dtype=np.float64).tobytes())
+        if data.b is not None:
+            h.update(np.ascontiguousarray(data.b[i], dtype=np.float64).tobytes())
+        if centers is not None:
+            h.update(b"centers")
+            h.update(np.ascontiguousarray(centers[i], dtype=np.int64).tobytes())
+
+        result[i] = h.hexdigest()
+
+    return result
@@ -0,0 +1,275 @@
+"""Containers for computed representations."""
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class Ragged:
+    """Local representation stored in one contiguous array.
+
+    cmlkit expects local representations as an ndarray-list of length n_systems,
+    where each entry is an ndarray of dim n_atoms_system x dim. Storing this as
+    a numpy object array breaks contiguity and makes pickling slow, so instead we
+    keep the flat n_total_atoms x dim array returned by dscribe, and an offset
+    array that keeps track of which rows belong to which system.
+
+    Indexing with an integer returns a view of the rows of that system, so this
+    can be used as a drop-in replacement for the object array. Indexing with a
+    slice or an index array returns a new Ragged.
+
+    Attributes:
+        data: ndarray n_total_atoms x dim
+        offsets: ndarray n_systems + 1, rows of system i are offsets[i]:offsets[i+1]
+        z: ndarray n_total_atoms with atomic numbers, or None
+
+    """
+
+    def __init__(self, data, offsets, z=None):
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=int)
+        self.z = z
+
+    @classmethod
+    def from_counts(cls, data, counts, z=None):
+        """Create from the number of atoms in each system."""
+        offsets = np.zeros(len(counts) + 1, dtype=int)
+        offsets[1::] = np.cumsum(counts)
+
+        return cls(data, offsets, z=z)
+
+    @property
+    def n(self):
+        return len(self.offsets) - 1
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    @property
+    def dim(self):
+        return self.data.shape[1]
+
+    @property
+    def shape(self):
+        # we look like an object array of length n
+        return (self.n,)
+
+    @property
+    def dtype(self):
+        # cmlkit checks for dtype == object to recognise local representations
+        return np.dtype(object)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0:
+                idx += self.n
+            if not 0 <= idx < self.n:
+                raise IndexError(f"Index {idx} out of range for {self.n} systems.")
+
+            return self.data[self.offsets[idx] : self.offsets[idx + 1]]
+
+        elif isinstance(idx, slice):
+            start, stop, step = idx.indices(self.n)
+            if step == 1:
+                offsets = self.offsets[start : max(start, stop) + 1]
+                rows = slice(offsets[0], offsets[-1])
+
+                return Ragged(
+                    self.data[rows],
+                    offsets - offsets[0],
+                    z=self.z[rows] if self.z is not None else None,
+                )
+
+            idx = np.arange(start, stop, step)
+
+        idx = np.arange(self.n)[idx]
+        rows = _rows(self.offsets, idx)
+
+        return Ragged.from_counts(
+            self.data[rows],
+            self.counts[idx],
+            z=self.z[rows] if self.z is not None else None,
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        # the object array of views is always new (numpy 2 passes copy)
+        if copy is False:
+            raise ValueError("Ragged can not be converted to an array without copy.")
+
+        # the rows have different lengths, so only an array of objects is possible
+        if dtype is not None and np.dtype(dtype) != object:
+            raise ValueError(
+                f"Ragged can only be converted to an array of objects, not {dtype}. "
+                "(Use .data for the rows of all systems in one array.)"
+            )
+
+        result = np.empty(self.n, dtype=object)
+        for i in range(self.n):
+            result[i] = self[i]
+
+        return result
+
+    def __repr__(self):
+        return f"Ragged(n={self.n}, dim={self.dim})"
+
+
+class ByElement:
+    """Local representation split by central element.
+
+    Per-element kernels only ever compare atoms with the same central element,
+    so instead of zero-padded element blocks, we can store one dense matrix per
+    element, containing the representations of all atoms of that element in the
+    dataset. Index maps keep track of where each row came from.
+
+    Indexing with an atomic number returns the matrix for that element.
+
+    Attributes:
+        elems: List of elements
+        blocks: Dict of element -> ndarray n_atoms_element x dim
+        system: Dict of element -> ndarray with the system index of each row
+        atom: Dict of element -> ndarray with the atom index (within its system)
+            of each row
+        n: Number of systems
+
+    """
+
+    def __init__(self, elems, blocks, system, atom, n=None):
+        self.elems = list(elems)
+        self.blocks = blocks
+        self.system = system
+        self.atom = atom
+
+        if n is None:
+            n = max([s.max() + 1 for s in system.values() if len(s) > 0] + [0])
+        self.n = n
+
+    @property
+    def dim(self):
+        return self.blocks[self.elems[0]].shape[1]
+
+    def __len__(self):
+        return len(self.elems)
+
+    def __iter__(self):
+        return iter(self.elems)
+
+    def __contains__(self, elem):
+        return elem in self.blocks
+
+    def __getitem__(self, elem):
+        return self.blocks[elem]
+
+    def items(self):
+        return ((e, self.blocks[e]) for e in self.elems)
+
+    def __repr__(self):
+        counts = {e: self.blocks[e].shape[0] for e in self.elems}
+        return f"ByElement(counts={counts}, dim={self.dim})"
+
+
+def concatenate(reps, n_rows=None, allocate=np.empty):
+    """Concatenate representations computed for consecutive chunks of a dataset.
+
+    reps may be a generator, which is consumed one chunk at a time. If n_rows,
+    the total number of rows (atoms for local, systems for global
+    representations) is given, dense outputs are copied into a preallocated
+    array as they arrive, so only one chunk is held in memory at a time.
+
+    Args:
+        reps: Iterable of ndarray, sparse matrix, Ragged or ByElement
+        n_rows: Total number of rows, optional
+        allocate: Function (shape, dtype) -> array used to preallocate
+            the dense output, for instance to allocate a np.memmap.
+            Default np.empty.
+
+    Returns:
+        Concatenated representation, same type as the inputs
+
+    """
+    reps = iter(reps)
+    first = next(reps)
+
+    if isinstance(first, ByElement):
+        return _concatenate_by_element([first] + list(reps))
+
+    if isinstance(first, Ragged):
+        counts = [first.counts]
+        z = [first.z]
+
+        def chunks():
+            yield first.data
+            for rep in reps:
+                counts.append(rep.counts)
+                z.append(rep.z)
+                yield rep.data
+
+        data = _concatenate_rows(chunks(), n_rows, allocate=allocate)
+        z = np.concatenate(z) if first.z is not None else None
+
+        return Ragged.from_counts(data, np.concatenate(counts), z=z)
+
+    def chunks():
+        yield first
+        yield from reps
+
+    return _concatenate_rows(chunks(), n_rows, allocate=allocate)
+
+
+def _concatenate_rows(chunks, n_rows, allocate=np.empty):
+    chunks = iter(chunks)
+    first = next(chunks)
+
+    if sp.issparse(first) or n_rows is None:
+        rest = [first] + list(chunks)
+        if sp.issparse(first):
+            return sp.vstack(rest, format="csr")
+        else:
+            return np.concatenate(rest, axis=0)
+
+    result = allocate((n_rows, *first.shape[1:]), first.dtype)
+    result[0 : len(first)] = first
+    start = len(first)
+    del first
+
+    for chunk in chunks:
+        result[start : start + len(chunk)] = chunk
+        start += len(chunk)
+
+    assert start == n_rows, f"Expected {n_rows} rows, but got {start}."
+
+    return result
+
+
+def _concatenate_by_element(reps):
+    elems = reps[0].elems
+
+    shifts = np.zeros(len(reps), dtype=int)
+    shifts[1::] = np.cumsum([rep.n for rep in reps])[:-1]
+
+    blocks, system, atom = {}, {}, {}
+    for e in elems:
+        blocks[e] = _concatenate_rows([rep.blocks[e] for rep in reps], None)
+        system[e] = np.concatenate(
+            [rep.system[e] + shift for rep, shift in zip(reps, shifts)]
+        )
+        atom[e] = np.concatenate([rep.atom[e] for rep in reps])
+
+    return ByElement(elems, blocks, system, atom, n=sum(rep.n for rep in reps))
+
+
+def _rows(offsets, idx):
+    """Row indices of the systems idx, in order."""
+    starts = offsets[idx]
+    counts = offsets[idx + 1] - starts
+
+    # position of each row within its system, added to the start of that system
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return np.repeat(starts, counts) + within
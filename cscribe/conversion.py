@@ -1,9 +1,12 @@
 """Convert representations for cmlkit"""
 
 import numpy as np
+import scipy.sparse as sp
 
+from .containers import Ragged, ByElement
 
-def to_local(data, rep):
+
+def to_local(data, rep, centers=None):
     """Convert dscribe-style atomic rep to cmlkit-style atomic rep.
 
     dscribe returns local descriptors as one flat array of dimension
@@ -13,27 +16,26 @@ def to_local(data, rep):
 
     The translation between these two notations is done via an offset array,
     which keeps track of which entries in the dscribe array belong to which atom.
+    The dscribe array is not copied; the result is a Ragged, which indexes like
+    the ndarray-list cmlkit expects.
 
     Args:
         data: Dataset instance
         rep: ndarray n_total_atoms x dim
+        centers: Indices of the atoms in each system that rep was computed for
+            (see center_indices), or None (default) for all atoms
 
     Returns:
-        cmlkit-style atomic representation
+        cmlkit-style atomic representation (Ragged)
 
     """
 
-    counts = data.info["atoms_by_system"]
-
-    offsets = np.zeros(len(counts) + 1, dtype=int)
-    offsets[1::] = np.cumsum(counts)
-
-    return np.array(
-        [rep[offsets[i] : offsets[i + 1]] for i in range(data.n)], dtype=object
+    return Ragged(
+        rep, _offsets(_counts(data, centers)), z=_flat_z(data, centers=centers)
     )
 
 
-def in_blocks(data, rep, elems=None):
+def in_blocks(data, rep, elems=None, sparse=False, dtype=np.float64, centers=None):
     """Arrange local representation in blocks by element.
 
     Some representations (ACSF) are returned without taking the central atom type
@@ -53,33 +55,273 @@ def in_blocks(data, rep, elems=None):
     I.e. we will have separate blocks for each central atom, filled with zeros where
     the central atom type is "not in use".
 
+    With sparse=True, the blocks are written straight into a CSR matrix,
+    which only stores the non-zero entries of each atom, so the padding is never
+    materialised. The input may be dense or sparse in either case.
+
+    Args:
+        data: Dataset instance
+        rep: cmlkit-style atomic representation (Ragged or ndarray-list)
+        elems: List of elements to take into account,
+            if not specified will use the ones given in data.
+        sparse: Whether to return a scipy.sparse.csr_matrix-backed Ragged,
+            default False
+        dtype: dtype of the dense output, default float64
+        centers: Indices of the atoms in each system that rep was computed for
+            (see center_indices), or None (default) for all atoms
+
+    Returns:
+        cmlkit-style atomic representation (Ragged)
+
+    """
+    if elems is None:
+        elems = data.info["elements"]
+
+    n_elems = len(elems)
+
+    flat = _flatten(rep)
+    n_atoms, dim = flat.shape
+
+    z = _flat_z(data, centers=centers)
+    idx = element_indices(z, elems)
+
+    if sparse:
+        new = _sparse_blocks(flat, idx, n_elems)
+    else:
+        if sp.issparse(flat):
+            flat = flat.toarray()
+
+        new = np.zeros((n_atoms, dim * n_elems), dtype=dtype)
+        new.reshape(n_atoms, n_elems, dim)[np.arange(n_atoms), idx] = flat
+
+    return Ragged(new, _offsets(_counts(data, centers)), z=z)
+
+
+def _sparse_blocks(flat, idx, n_elems):
+    """Shift the columns of each row into the block given by idx, as CSR."""
+    n_atoms, dim = flat.shape
+
+    if sp.issparse(flat):
+        flat = flat.tocsr()
+        row = np.repeat(np.arange(n_atoms), np.diff(flat.indptr))
+
+        values = flat.data
+        indices = flat.indices + idx[row] * dim
+        indptr = flat.indptr
+    else:
+        row, col = np.nonzero(flat)
+
+        values = flat[row, col]
+        indices = idx[row] * dim + col
+        indptr = np.zeros(n_atoms + 1, dtype=int)
+        indptr[1::] = np.cumsum(np.bincount(row, minlength=n_atoms))
+
+    return sp.csr_matrix((values, indices, indptr), shape=(n_atoms, dim * n_elems))
+
+
+def by_element(data, rep, elems=None, centers=None):
+    """Split local representation into one matrix per central element.
+
+    This is an alternative to in_blocks for per-element kernels, which
+    only compare atoms with the same central element: Instead of padding
+    every atom with zeros, we collect the rows of all atoms of a given element
+    into one matrix, and keep index maps back to (system, atom).
+
     Args:
         data: Dataset instance
-        rep: cmlkit-style atomic representation
+        rep: cmlkit-style atomic representation (Ragged or ndarray-list)
         elems: List of elements to take into account,
             if not specified will use the ones given in data.
+        centers: Indices of the atoms in each system that rep was computed for
+            (see center_indices), or None (default) for all atoms
 
     Returns:
-        cmlkit-style atomic representation
+        ByElement
 
     """
     if elems is None:
-        n_elems = data.info["total_elements"]
-        elem_idx = {e: i for i, e in enumerate(data.info["elements"])}
+        elems = data.info["elements"]
+
+    offsets = _offsets(_counts(data, centers))
+    idx = element_indices(_flat_z(data, centers=centers), elems)
+
+    # one stable sort groups rows by element while keeping the dataset order
+    order = np.argsort(idx, kind="stable")
+    ends = np.cumsum(np.bincount(idx, minlength=len(elems)))
+    grouped = _flatten(rep)[order]
+
+    system = np.searchsorted(offsets, order, side="right") - 1
+    if centers is None:
+        atom = order - offsets[system]
+    else:
+        atom = np.concatenate([np.asarray(c, dtype=int) for c in centers])[order]
+
+    blocks, systems, atoms = {}, {}, {}
+    start = 0
+    for i, e in enumerate(elems):
+        stop = ends[i]
+        blocks[e] = grouped[start:stop]
+        systems[e] = system[start:stop]
+        atoms[e] = atom[start:stop]
+        start = stop
+
+    return ByElement(elems, blocks, systems, atoms, n=data.n)
+
+
+def stratified(
+    data, rep, elems=None, stratify=True, sparse=False, dtype=np.float64, centers=None
+):
+    """Convert dscribe-style atomic rep, optionally stratifying by element.
+
+    Args:
+        data: Dataset instance
+        rep: ndarray n_total_atoms x dim
+        elems: List of elements to take into account
+        stratify: True for zero-padded element blocks (see in_blocks),
+            "elements" for one matrix per element (see by_element),
+            False for no stratification.
+        sparse: Whether to assemble element blocks as sparse matrix
+        dtype: dtype of the zero-padded element blocks, default float64
+        centers: Indices of the atoms in each system that rep was computed for
+            (see center_indices), or None (default) for all atoms
+
+    Returns:
+        Ragged or ByElement
+
+    """
+    check_stratify(stratify)
+
+    local = to_local(data, rep, centers=centers)
+
+    if stratify == "elements":
+        return by_element(data, local, elems=elems, centers=centers)
+    elif stratify:
+        return in_blocks(
+            data, local, elems=elems, sparse=sparse, dtype=dtype, centers=centers
+        )
+    else:
+        return local
+
+
+def check_stratify(stratify):
+    if stratify not in [True, False, "elements"]:
+        raise ValueError(
+            f"Unknown stratification {stratify}. (Allowed: True, False, 'elements'.)"
+        )
+
+
+def center_indices(data, centers):
+    """Indices of the atoms selected as centers in each system of data.
+
+    Args:
+        data: Dataset instance
+        centers: Which atoms to select, either
+            None: All atoms,
+            list of elements: All atoms of these elements,
+            str: Name of a property of data, which contains for each system
+                either the indices of the selected atoms, or a boolean mask.
+
+    Returns:
+        List of int ndarrays, one per system, or None if all atoms are selected
+
+    """
+    if centers is None:
+        return None
+
+    if isinstance(centers, str):
+        if centers not in data.p:
+            raise ValueError(f"Dataset {data.name} has no property {centers}.")
+
+        result = []
+        for selected, z in zip(data.p[centers], data.z):
+            selected = np.asarray(selected)
+            if selected.dtype == bool:
+                if len(selected) != len(z):
+                    raise ValueError(
+                        f"Mask of length {len(selected)} for system of {len(z)} atoms."
+                    )
+                selected = np.flatnonzero(selected)
+
+            selected = selected.astype(int)
+            if ((selected < 0) | (selected >= len(z))).any():
+                raise ValueError(f"Center indices {selected} out of range.")
+
+            result.append(selected)
+
+        return result
     else:
-        n_elems = len(elems)
-        elem_idx = {e: i for i, e in enumerate(elems)}
+        elems = np.asarray(centers, dtype=int)
+        return [np.flatnonzero(np.isin(z, elems)) for z in data.z]
+
+
+def centers_from_mask(data, mask):
+    """Split a boolean mask over all atoms in data into one mask per system.
+
+    The result can be added as property to data, and used with centers.
+
+    """
+    mask = np.asarray(mask, dtype=bool)
+    offsets = _offsets(data.info["atoms_by_system"])
+
+    result = np.empty(data.n, dtype=object)
+    result[:] = [mask[offsets[i] : offsets[i + 1]] for i in range(data.n)]
+
+    return result
+
+
+def element_indices(z, elems):
+    """Map atomic numbers to their position in a list of elements.
+
+    Args:
+        z: ndarray of atomic numbers
+        elems: List of elements
+
+    Returns:
+        ndarray of the same shape as z with the index of each element in elems
+
+    """
+
+    z = np.asarray(z, dtype=int)
+    elems = np.asarray(elems, dtype=int)
 
-    all_new = []
+    lookup = np.full(max(z.max(initial=0), elems.max(initial=0)) + 1, -1, dtype=int)
+    lookup[elems] = np.arange(len(elems))
+    idx = lookup[z]
 
-    for i, rep_system in enumerate(rep):
-        dim = len(rep_system[0])
-        new = np.zeros((len(rep_system), dim * n_elems))
+    if (idx < 0).any():
+        missing = np.unique(z[idx < 0])
+        raise ValueError(f"Elements {missing.tolist()} are not in {elems.tolist()}.")
 
-        for j, rep_atom in enumerate(rep_system):
-            idx = elem_idx[data.z[i][j]]
-            new[j, idx * dim : (idx + 1) * dim] = rep_atom
+    return idx
 
-        all_new.append(new)
 
-    return np.array(all_new, dtype=object)
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=int)
+    offsets[1::] = np.cumsum(counts)
+
+    return offsets
+
+
+def _flatten(rep):
+    if isinstance(rep, Ragged):
+        return rep.data
+    elif sp.issparse(rep[0]):
+        return sp.vstack(list(rep), format="csr")
+    else:
+        return np.concatenate([np.asarray(rep_system) for rep_system in rep], axis=0)
+
+
+def _counts(data, centers=None):
+    if centers is None:
+        return data.info["atoms_by_system"]
+    else:
+        return np.array([len(c) for c in centers], dtype=int)
+
+
+def _flat_z(data, centers=None):
+    if centers is None:
+        return np.concatenate(data.z).astype(int)
+    else:
+        return np.concatenate(
+            [np.asarray(z)[c] for z, c in zip(data.z, centers)]
+        ).astype(int)
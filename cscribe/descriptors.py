@@ -0,0 +1,72 @@
+"""Memoization of dscribe descriptor objects.
+
+Setting up a dscribe descriptor is not free: SOAP with the polynomial radial
+basis, for instance, orthonormalises the basis each time. Since the same
+descriptor is typically set up many times in a row (for instance in a
+cross-validation loop), the constructed objects are kept in memory, keyed by
+a hash of the kind, config and the periodic flag, and reused.
+
+The time spent on setting up descriptors is tracked in `stats`:
+
+    hits: Number of times a descriptor was reused
+    misses: Number of times a descriptor had to be set up
+    setup_seconds: Total time spent on setting up descriptors
+    saved_seconds: Total setup time avoided by reusing descriptors
+
+"""
+
+import time
+from collections import OrderedDict
+
+from cmlkit.engine import compute_hash
+
+max_entries = 64
+
+stats = {"hits": 0, "misses": 0, "setup_seconds": 0.0, "saved_seconds": 0.0}
+
+_memo = OrderedDict()
+
+
+def get(kind, config, periodic, make):
+    """Return memoized descriptor, or set it up with make() and memoize it.
+
+    Args:
+        kind: Component kind
+        config: Config the descriptor is set up from (must be hashable by cmlkit)
+        periodic: Whether the descriptor is periodic
+        make: Function without arguments that sets up the descriptor
+
+    Returns:
+        dscribe descriptor
+
+    """
+    key = compute_hash(kind, config, periodic)
+
+    if key in _memo:
+        descriptor, setup_seconds = _memo[key]
+        _memo.move_to_end(key)
+
+        stats["hits"] += 1
+        stats["saved_seconds"] += setup_seconds
+
+        return descriptor
+
+    start = time.time()
+    descriptor = make()
+    setup_seconds = time.time() - start
+
+    stats["misses"] += 1
+    stats["setup_seconds"] += setup_seconds
+
+    _memo[key] = (descriptor, setup_seconds)
+    while len(_memo) > max_entries:
+        _memo.popitem(last=False)
+
+    return descriptor
+
+
+def clear():
+    """Forget all memoized descriptors and reset stats."""
+    _memo.clear()
+    for key in stats:
+        stats[key] = type(stats[key])(0)
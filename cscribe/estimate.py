@@ -0,0 +1,120 @@
+"""Estimate the size of the output, and the runtime, before computing.
+
+The feature dimension is obtained from the dscribe descriptor itself, so it
+is exact, and together with the number of atoms (or systems) in the dataset
+this yields the exact size of the dense output. The runtime is only a rough
+guess: it is assumed to be proportional to the number of entries in the raw
+dscribe output, with a rate per entry taken from the calibration table below.
+The rates shipped here are rough placeholders (orders of magnitude), not
+measurements. Since n_jobs="auto" depends on them, they should be measured
+for a given machine and dataset with `calibrate` before relying on it.
+
+"""
+
+import time
+import numpy as np
+
+# dscribe computes in single precision, in_blocks assembles in double precision
+# (unless a dtype is set in the context)
+RAW_DTYPE = np.dtype(np.float32)
+STRATIFIED_ITEMSIZE = np.dtype(np.float64).itemsize
+
+# seconds per entry (atom x feature) of the raw dscribe output,
+# rough placeholders until replaced by calibrate
+calibration = {
+    "ds_soap": 1e-7,
+    "ds_soap_average": 1e-7,
+    "ds_sf": 2e-6,
+    "ds_mbtr": 4e-7,
+    "ds_lmbtr": 2e-6,
+}
+
+
+def estimate(component, data):
+    """Estimate output size and runtime of component for data.
+
+    Args:
+        component: cscribe Representation
+        data: Dataset, or the number of atoms in each system
+            (i.e. data.info["atoms_by_system"]). In the latter case, the
+            centers config entry is ignored, i.e. all atoms are counted.
+
+    Returns:
+        dict with keys
+            n_rows: Number of rows of the output (atoms, or systems if global)
+            dim: Width of each row of the output
+            raw_dim: Width of each row of the dscribe output
+            bytes: Size of the output as configured. For sparse output,
+                this is the size of the equivalent dense output,
+                i.e. an upper bound.
+            bytes_flat: Size of the output, not stratified (after column
+                selection and projection)
+            bytes_stratified: Size of the output when stratified into
+                blocks by element (None for global representations)
+            seconds: Rough estimate of the runtime on one core
+
+    """
+    if component.local and hasattr(data, "info"):
+        # only the selected centers are computed
+        counts = np.asarray(component._rows_by_system(data), dtype=int)
+    else:
+        counts = atoms_by_system(data)
+
+    if component.local:
+        n_rows = int(np.sum(counts))
+    else:
+        n_rows = len(counts)
+
+    raw_dim = component._raw_dim()
+    flat_dim = component._flat_dim()
+
+    if component.local:
+        n_elems = len(component._get_config()["elems"])
+        itemsize = component._dtype(default=np.float64).itemsize
+        bytes_stratified = n_rows * flat_dim * n_elems * itemsize
+    else:
+        bytes_stratified = None
+
+    return {
+        "n_rows": n_rows,
+        "dim": component._dim(),
+        "raw_dim": raw_dim,
+        "bytes": n_rows * component._row_bytes(),
+        "bytes_flat": n_rows * flat_dim * component._dtype(default=RAW_DTYPE).itemsize,
+        "bytes_stratified": bytes_stratified,
+        "seconds": int(np.sum(counts)) * raw_dim * calibration[component.kind],
+    }
+
+
+def calibrate(component, data):
+    """Measure the runtime of component on data, and update the calibration table.
+
+    Args:
+        component: cscribe Representation
+        data: Dataset, ideally representative of the datasets to be estimated
+
+    Returns:
+        Measured seconds per entry of the raw dscribe output
+
+    """
+    start = time.time()
+    component._create(data)
+    duration = time.time() - start
+
+    if component.local:
+        n_atoms = component._n_rows(data)
+    else:
+        n_atoms = data.info["total_atoms"]
+
+    rate = duration / (n_atoms * component._raw_dim())
+    calibration[component.kind] = rate
+
+    return rate
+
+
+def atoms_by_system(data):
+    """Number of atoms in each system of data (Dataset or array of counts)."""
+    if hasattr(data, "info"):
+        return np.asarray(data.info["atoms_by_system"], dtype=int)
+    else:
+        return np.asarray(data, dtype=int)
@@ -0,0 +1,244 @@
+"""Kernel matrices computed straight from descriptors, block by block.
+
+For kernel ridge regression, only the kernel matrix between training and
+query systems is needed, not the descriptors themselves. kernel_matrix
+therefore computes the descriptors of one block of systems at a time,
+evaluates the kernel tiles between this block and the blocks of the other
+set, and then drops them, so the descriptors of the full dataset never
+have to exist at once.
+
+Descriptors of the column blocks are kept in memory up to max_bytes,
+and recomputed if they had to be dropped; with a large enough max_bytes,
+every block is computed exactly once. Tiles are evaluated in a thread pool
+(numpy releases the GIL for the matrix products), while the descriptors
+themselves are computed as configured in the context of the component
+(except for output, as blocks are only needed in memory).
+
+For local representations, the kernel between two systems is the sum of
+the kernel over all pairs of atoms, which is evaluated on the flat per-atom
+arrays (Ragged or ByElement, where only atoms of the same element are
+compared), and then summed per system with sparse indicator matrices,
+without padding or per-system loops.
+
+Kernels (with the conventions of cmlkit):
+
+    linear: x . y
+    polynomial: (x . y + coef0) ** degree
+    gaussian: exp(-|x - y|^2 / (2 ls^2))
+
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def kernel_matrix(
+    component,
+    data,
+    other=None,
+    kernel="gaussian",
+    chunk_bytes=2**27,
+    max_bytes=2**30,
+    n_jobs=1,
+    **params,
+):
+    """Kernel matrix between the systems of data and other.
+
+    Args:
+        component: cscribe Representation
+        data: Dataset (rows)
+        other: Dataset (columns), or None (default) for data itself, in which
+            case only one triangle of tiles is computed
+        kernel: "linear", "polynomial" or "gaussian" (default)
+        chunk_bytes: Approximate size of the descriptors of each block, in bytes
+        max_bytes: Maximum size of the column descriptors kept in memory
+        n_jobs: Number of threads for evaluating tiles
+        **params: Parameters of the kernel (ls, or degree and coef0)
+
+    Returns:
+        ndarray of shape (data.n, other.n)
+
+    """
+    function = _kernel(kernel, **params)
+    component = _in_memory(component)
+
+    symmetric = other is None
+    if symmetric:
+        other = data
+
+    rows = list(component._chunks(data, chunk_bytes=chunk_bytes))
+    if symmetric:
+        columns = rows
+    else:
+        columns = list(component._chunks(other, chunk_bytes=chunk_bytes))
+
+    row_starts = _starts(rows)
+    column_starts = _starts(columns)
+
+    blocks = _Blocks(component, columns, max_bytes)
+    result = np.zeros((data.n, other.n))
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for i, chunk in enumerate(rows):
+            x = prepare(component.compute(chunk))
+            if symmetric:
+                blocks.put(i, x)
+                todo = list(range(i + 1))
+            else:
+                todo = list(range(len(columns)))
+
+            # only n_jobs column blocks are held for the tiles at a time
+            for start in range(0, len(todo), n_jobs):
+                batch = todo[start : start + n_jobs]
+                ys = [blocks.get(j) for j in batch]
+                tiles = pool.map(lambda y: evaluate(function, x, y), ys)
+
+                for j, tile in zip(batch, tiles):
+                    r = slice(row_starts[i], row_starts[i + 1])
+                    c = slice(column_starts[j], column_starts[j + 1])
+                    result[r, c] = tile
+                    if symmetric and i != j:
+                        result[c, r] = tile.T
+
+    return result
+
+
+def prepare(rep):
+    """Split a representation into parts of (descriptors, norms, systems).
+
+    Each part consists of a dense float64 matrix of descriptors (one per atom
+    for local representations, or per system otherwise), their squared norms,
+    and a sparse n_systems x n_rows matrix that sums rows into systems
+    (None for global representations). Only parts at the same position are
+    compared, which is how ByElement restricts kernels to the same element.
+
+    """
+    if hasattr(rep, "blocks"):
+        # ByElement
+        return [
+            _part(rep[e], _indicator(rep.system[e], rep.n, len(rep.system[e])))
+            for e in rep.elems
+        ]
+    elif hasattr(rep, "offsets"):
+        # Ragged
+        counts = rep.counts
+        system = np.repeat(np.arange(rep.n), counts)
+        return [_part(rep.data, _indicator(system, rep.n, int(np.sum(counts))))]
+    else:
+        return [_part(rep, None)]
+
+
+def evaluate(function, x, y):
+    """Kernel tile between prepared representations x and y."""
+    result = None
+    for (a, a_norms, a_systems), (b, b_norms, b_systems) in zip(x, y):
+        tile = function(a, b, a_norms, b_norms)
+
+        if a_systems is not None:
+            tile = a_systems @ (b_systems @ tile.T).T
+
+        if result is None:
+            result = tile
+        else:
+            result = result + tile
+
+    return np.asarray(result)
+
+
+def _part(rep, systems):
+    if sp.issparse(rep):
+        rep = rep.toarray()
+
+    rep = np.asarray(rep, dtype=np.float64)
+
+    return rep, np.einsum("ij,ij->i", rep, rep), systems
+
+
+def _indicator(system, n_systems, n_rows):
+    return sp.csr_matrix(
+        (np.ones(n_rows), (np.asarray(system, dtype=int), np.arange(n_rows))),
+        shape=(n_systems, n_rows),
+    )
+
+
+def _kernel(kernel, ls=1.0, degree=2, coef0=1.0):
+    if kernel == "linear":
+
+        def function(a, b, a_norms, b_norms):
+            return a @ b.T
+
+    elif kernel == "polynomial":
+
+        def function(a, b, a_norms, b_norms):
+            return (a @ b.T + coef0) ** degree
+
+    elif kernel == "gaussian":
+
+        def function(a, b, a_norms, b_norms):
+            sqdist = a_norms[:, None] + b_norms[None, :] - 2 * (a @ b.T)
+            return np.exp(-np.maximum(sqdist, 0.0) / (2 * ls**2))
+
+    else:
+        raise ValueError(
+            f"Unknown kernel {kernel}. (Allowed: linear, polynomial and gaussian.)"
+        )
+
+    return function
+
+
+def _in_memory(component):
+    """Copy of component that keeps blocks in memory, ignoring the output setting.
+
+    Blocks are dropped and recomputed, so writing each one to disk is wasted.
+    The other context settings, including the caches, are kept.
+
+    """
+    if component.context["output"] is None:
+        return component
+
+    return type(component)(
+        **component._get_config(), context={**component.context, "output": None}
+    )
+
+
+def _starts(chunks):
+    starts = np.zeros(len(chunks) + 1, dtype=int)
+    starts[1::] = np.cumsum([chunk.n for chunk in chunks])
+
+    return starts
+
+
+class _Blocks:
+    """Prepared descriptors of chunks, computed on demand, kept up to max_bytes."""
+
+    def __init__(self, component, chunks, max_bytes):
+        self.component = component
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+
+        self.stored = OrderedDict()
+
+    def get(self, i):
+        if i in self.stored:
+            self.stored.move_to_end(i)
+            return self.stored[i]
+
+        prepared = prepare(self.component.compute(self.chunks[i]))
+        self.put(i, prepared)
+
+        return prepared
+
+    def put(self, i, prepared):
+        self.stored[i] = prepared
+        self.stored.move_to_end(i)
+
+        while len(self.stored) > 1 and self._size() > self.max_bytes:
+            self.stored.popitem(last=False)
+
+    def _size(self):
+        return sum(
+            part[0].nbytes for prepared in self.stored.values() for part in prepared
+        )
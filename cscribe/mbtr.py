@@ -1,9 +1,15 @@
-from cmlkit.representation import Representation
+import numpy as np
+from scipy.special import ndtr
+
 from cmlkit.engine import parse_config
 from dscribe.descriptors import MBTR as dsMBTR
 from dscribe.descriptors import LMBTR as dsLMBTR
 
-from .conversion import to_local, in_blocks
+from .representation import Representation, Stratified
+from .conversion import check_stratify
+
+# largest fine grid compute_variants will set up, see _fine_grid
+max_fine_num = 2**14
 
 
 class MBTR(Representation):
@@ -24,6 +30,10 @@ class MBTR(Representation):
         normalize_gaussians: Bool, default True
         flatten: Bool, default True (False can only be used for diagnostics)
         sparse: Bool, default False (True is untested in cmlkit)
+        columns: Indices of the columns of the dscribe output to keep, or None
+            (default) to keep all, see Representation.pruned.
+        projection: Config of a projection of the dscribe output onto fewer
+            dimensions, or None (default), see Representation.projected.
 
 
 
@@ -46,6 +56,7 @@ class MBTR(Representation):
     """
 
     kind = "ds_mbtr"
+    local = False
     default_context = {"n_jobs": 1, "verbose": False}
 
     def __init__(
@@ -58,6 +69,8 @@ class MBTR(Representation):
         norm=None,
         flatten=True,
         sparse=False,
+        columns=None,
+        projection=None,
         context={},
     ):
         super().__init__(context=context)
@@ -81,27 +94,22 @@ class MBTR(Representation):
             "normalize_gaussians": normalize_gaussians,
             "norm": norm,
             "sparse": sparse,
+            "columns": columns,
+            "projection": projection,
         }
 
     def _get_config(self):
         return self.config
 
-    def compute(self, data):
-        if data.b is None:
-            ds_mbtr = dsMBTR(**{**self.ds_config, "periodic": False})
-        else:
-            ds_mbtr = dsMBTR(**{**self.ds_config, "periodic": True})
+    def _descriptor_config(self):
+        # includes flatten, which is not part of the config
+        return self.ds_config
 
-        rep = ds_mbtr.create(
-            data.as_Atoms(),
-            n_jobs=self.context["n_jobs"],
-            verbose=self.context["verbose"],
-        )
+    def _descriptor(self, periodic):
+        return dsMBTR(**{**self.ds_config, "periodic": periodic})
 
-        return rep
 
-
-class LMBTR(MBTR):
+class LMBTR(Stratified, MBTR):
     """Local MBTR as implemented in dscribe.
 
     For details, see https://singroup.github.io/dscribe/tutorials/lmbtr.html
@@ -115,9 +123,19 @@ class LMBTR(MBTR):
         norm: Either None or "l2_each"
         normalize_gaussians: Bool, default True
         flatten: Bool, default True (False can only be used for diagnostics)
-        sparse: Bool, default False (True is untested in cmlkit)
+        sparse: Bool, default False (True is untested in cmlkit). If stratify is
+            True, the element blocks are also assembled as sparse matrix.
         stratify: Whether to arrange output in separate blocks depending on
-            central element type, default True
+            central element type, default True. With "elements", the output
+            is instead one matrix per central element (see conversion.by_element).
+        columns: Indices of the columns of the dscribe output to keep, or None
+            (default) to keep all, see Representation.pruned.
+        projection: Config of a projection of the dscribe output onto fewer
+            dimensions, or None (default), see Representation.projected.
+        centers: Atoms to compute the representation for, or None (default) for
+            all. Either a list of elements, or the name of a property of the
+            dataset with the indices (or a boolean mask) of the selected atoms
+            in each system, see conversion.center_indices.
 
     Each config dict has keys:
         start: Value of the first MBTR bin
@@ -137,6 +155,7 @@ class LMBTR(MBTR):
     """
 
     kind = "ds_lmbtr"
+    local = True
 
     def __init__(
         self,
@@ -149,6 +168,9 @@ class LMBTR(MBTR):
         flatten=True,
         sparse=False,
         stratify=True,
+        columns=None,
+        centers=None,
+        projection=None,
         context={},
     ):
         super().__init__(
@@ -160,28 +182,193 @@ class LMBTR(MBTR):
             norm=norm,
             flatten=flatten,
             sparse=sparse,
+            columns=columns,
+            projection=projection,
             context=context,
         )
 
+        check_stratify(stratify)
         self.config["stratify"] = stratify
+        self.config["centers"] = centers
+
+    def _descriptor(self, periodic):
+        return dsLMBTR(**{**self.ds_config, "periodic": periodic})
 
-    def compute(self, data):
-        if data.b is None:
-            ds_mbtr = dsLMBTR(**{**self.ds_config, "periodic": False})
+    def _create_kwargs(self, data):
+        if self._centers(data) is None:
+            return {"positions": [None for i in range(data.n)]}
         else:
-            ds_mbtr = dsLMBTR(**{**self.ds_config, "periodic": True})
+            return super()._create_kwargs(data)
+
+
+def compute_variants(data, components, resolution=4):
+    """Compute several MBTR variants that differ only in their grids at once.
+
+    Variants may differ in start, stop, num and broadening of each k-body
+    term, as well as in norm and normalize_gaussians, but must otherwise agree.
+
+    The geometry and weight contributions are enumerated only once, by
+    computing a single MBTR with a fine grid covering all variants, broadened
+    with part of the smallest requested broadening. Since the convolution of two
+    Gaussians is again a Gaussian, each variant is then obtained by treating the
+    fine bins as point weights, broadening them by the remaining width, and
+    integrating over its own bins. This is one matrix product for the whole
+    dataset.
+
+    The fine bins are 1/resolution of the smallest broadening wide; with the
+    default, results agree with direct computation to within 0.1% of the
+    largest value. The fine grid may have at most max_fine_num bins.
+    With norm="l2_each", k-body terms without contributions (for instance k=2
+    for a single atom) are zero, as in dscribe's flat output.
+
+    Args:
+        data: Dataset
+        components: List of MBTR (not LMBTR) with identical elems, weighting and
+            geometry functions, acc, and which k-body terms are present
+        resolution: Number of fine bins per smallest broadening
+
+    Returns:
+        List of representations, one for each component
+
+    """
+    first = components[0]
+    terms = [k for k in ["mbtr_1", "mbtr_2", "mbtr_3"] if first.config[k] is not None]
+
+    for component in components:
+        _check_variant(first, component, terms)
+
+    fine_configs = {
+        k: _fine_grid([c.config[k] for c in components], resolution) for k in terms
+    }
+    fine = MBTR(elems=first.config["elems"], **fine_configs, context=first.context)
+    rep = fine._create(data)
+
+    n_elems = len(first.config["elems"])
+    n_atoms = data.info["atoms_by_system"]
+
+    result = []
+    for component in components:
+        parts = []
+
+        offset = 0
+        for k in terms:
+            config = component.config[k]
+            fine_config = fine_configs[k]
+            n_fine = fine_config["num"]
+            width = _n_blocks(k, n_elems) * n_fine
+
+            # total weight of contributions in each fine bin
+            spacing = _spacing(fine_config)
+            weights = np.asarray(rep[:, offset : offset + width]).reshape(-1, n_fine)
+            weights = weights.astype(float) * spacing
+            offset += width
+
+            values = weights @ _rebin_matrix(fine_config, config)
+            values = values.reshape(data.n, -1)
+
+            if not component.config["normalize_gaussians"]:
+                values *= config["broadening"] * np.sqrt(2 * np.pi)
+
+            if component.config["norm"] == "l2_each":
+                norms = np.linalg.norm(values, axis=1)
+                # flat output is sparse in dscribe, which divides only the stored
+                # entries by the norm, so empty terms stay zero instead of nan
+                norms[norms == 0] = 1.0
+                values /= norms[:, None]
+            elif component.config["norm"] == "n_atoms":
+                values /= n_atoms[:, None]
+
+            parts.append(values)
 
-        rep = ds_mbtr.create(
-            data.as_Atoms(),
-            positions=[None for i in range(data.n)],
-            n_jobs=self.context["n_jobs"],
-            verbose=self.context["verbose"],
+        values = np.concatenate(parts, axis=1).astype(rep.dtype)
+        result.append(component._transform(values))
+
+    return result
+
+
+def _check_variant(first, component, terms):
+    if component.kind != "ds_mbtr":
+        raise ValueError(
+            f"MBTR variants can only be computed for MBTR, not {component.kind}."
         )
 
-        if self.config["stratify"]:
-            return in_blocks(data, to_local(data, rep), elems=self.config["elems"])
-        else:
-            return to_local(data, rep)
+    if component.config["sparse"] or not component.ds_config["flatten"]:
+        raise ValueError("MBTR variants can only be computed with dense, flat output.")
+
+    if component.config["elems"] != first.config["elems"]:
+        raise ValueError("MBTR variants must have the same elems.")
+
+    for k in ["mbtr_1", "mbtr_2", "mbtr_3"]:
+        if (component.config[k] is None) != (k not in terms):
+            raise ValueError(f"MBTR variants must all have {k}, or none of them.")
+
+    for k in terms:
+        for key in ["geomf", "weightf", "acc"]:
+            if component.config[k][key] != first.config[k][key]:
+                raise ValueError(f"MBTR variants must have the same {key} in {k}.")
+
+
+def _fine_grid(configs, resolution):
+    """Config with a fine grid that covers all configs, including the broadening."""
+    lower = min(c["start"] - _spacing(c) / 2 - 5 * c["broadening"] for c in configs)
+    upper = max(c["stop"] + _spacing(c) / 2 + 5 * c["broadening"] for c in configs)
+    spacing = min(c["broadening"] for c in configs) / resolution
+    num = max(int(np.ceil((upper - lower) / spacing)), 2)
+
+    if num > max_fine_num:
+        raise ValueError(
+            f"MBTR variants would need a fine grid of {num} bins, more than "
+            f"max_fine_num={max_fine_num}. Use a lower resolution, or compute "
+            "variants with very different ranges or broadenings separately."
+        )
+
+    return {
+        **configs[0],
+        "start": lower + spacing / 2,
+        "stop": lower + spacing / 2 + (num - 1) * spacing,
+        "num": num,
+        "broadening": min(c["broadening"] for c in configs) / np.sqrt(2),
+    }
+
+
+def _rebin_matrix(fine_config, config):
+    """Matrix mapping weights in fine bins to the broadened values of config.
+
+    dscribe integrates each Gaussian over the bins (of width spacing, centered on
+    the grid points) and divides by the spacing, so we do the same for a
+    Gaussian at the centre of each fine bin. Its width is what remains after
+    the broadening of the fine grid, and the spread of the fine bins, which
+    behaves like a Gaussian with variance spacing^2/12, are accounted for.
+
+    """
+    fine_spacing = _spacing(fine_config)
+    centres = fine_config["start"] + fine_spacing * np.arange(fine_config["num"])
+    broadening = np.sqrt(
+        config["broadening"] ** 2
+        - fine_config["broadening"] ** 2
+        - fine_spacing**2 / 12
+    )
+
+    spacing = _spacing(config)
+    edges = config["start"] - spacing / 2 + spacing * np.arange(config["num"] + 1)
+
+    cdf = ndtr((edges[None, :] - centres[:, None]) / broadening)
+
+    return np.diff(cdf, axis=1) / spacing
+
+
+def _spacing(config):
+    return (config["stop"] - config["start"]) / (config["num"] - 1)
+
+
+def _n_blocks(k, n_elems):
+    """Number of element combinations for k-body term k in dscribe's output."""
+    if k == "mbtr_1":
+        return n_elems
+    elif k == "mbtr_2":
+        return n_elems * (n_elems + 1) // 2
+    else:
+        return n_elems * n_elems * (n_elems + 1) // 2
 
 
 def _to_dscribe_config(
@@ -0,0 +1,149 @@
+"""Cached neighbourhoods of periodic systems.
+
+For periodic systems, dscribe first builds an extended system that repeats
+the unit cell often enough to cover the cutoff in every direction, and then
+computes the descriptor for the atoms of the original cell. This is repeated
+for every system, in every call, for every component, and the extended system
+contains many atoms that are not within the cutoff of any central atom, but
+are still visited when computing the descriptor.
+
+Here, the environment of a periodic system is instead built once: the atoms of
+the unit cell, followed by all periodic images within the cutoff of at least
+one of them. Descriptors can then be computed for the first atoms of this
+finite system, with periodic=False, which gives the same result as the
+periodic computation. Environments are kept in memory, keyed by a fingerprint
+of the system, and an environment built with a larger cutoff is reused for
+smaller ones by dropping the atoms that are too far away. This way, several
+components and hyperparameter variants on the same dataset share the work.
+
+The cache is shared by the whole process, and holds at most max_bytes of
+environments (256MiB by default); least recently used ones are dropped first,
+and environments larger than that on their own are not kept at all.
+It is only used if the neighbour_cache context setting is enabled, since the
+results agree with dscribe's periodic computation only up to float32 rounding.
+
+"""
+
+import numpy as np
+from collections import OrderedDict
+from scipy.spatial import cKDTree
+
+from .cache import fingerprints
+
+max_bytes = 2**28
+
+_memo = OrderedDict()
+_size = 0
+
+
+def environments(data, cutoff):
+    """Finite environments of the periodic systems in data.
+
+    Args:
+        data: Dataset with cell (data.b)
+        cutoff: Radius within which atoms are included
+
+    Returns:
+        List of (z, r) for each system; the first atoms are the
+        original ones, in their original order
+
+    """
+    return [
+        environment(fingerprint, z, r, b, cutoff)
+        for fingerprint, z, r, b in zip(fingerprints(data), data.z, data.r, data.b)
+    ]
+
+
+def environment(fingerprint, z, r, b, cutoff):
+    """Finite environment of one periodic system, using the in-memory cache.
+
+    Args:
+        fingerprint: Fingerprint of the system, see cache.fingerprints
+        z, r, b: Atomic numbers, positions and cell of the system
+        cutoff: Radius within which atoms are included
+
+    Returns:
+        (z, r) of the environment
+
+    """
+    entry = _memo.get(fingerprint, None)
+
+    if entry is None or entry[0] < cutoff:
+        entry = (cutoff, *build_environment(z, r, b, cutoff))
+        _store(fingerprint, entry)
+    else:
+        _memo.move_to_end(fingerprint)
+
+    _, env_z, env_r, distance = entry
+    keep = distance <= cutoff
+
+    return env_z[keep], env_r[keep]
+
+
+def build_environment(z, r, b, cutoff):
+    """Build the finite environment of a periodic system.
+
+    Args:
+        z, r, b: Atomic numbers, positions and cell of the system
+        cutoff: Radius within which atoms are included
+
+    Returns:
+        z, r of the environment, and the distance of each of its atoms to
+        the closest original atom (zero for the original atoms)
+
+    """
+    z = np.asarray(z)
+    r = np.asarray(r, dtype=float)
+    cell = np.asarray(b, dtype=float)
+
+    # number of copies needed in each direction: cutoff over the distance
+    # between opposite faces of the cell
+    volume = abs(np.linalg.det(cell))
+    areas = np.linalg.norm(np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]]), axis=1)
+    n_copies = np.ceil(cutoff / (volume / areas)).astype(int)
+
+    shifts = np.array(
+        np.meshgrid(*[np.arange(-n, n + 1) for n in n_copies], indexing="ij")
+    ).reshape(3, -1)
+    shifts = shifts[:, np.any(shifts != 0, axis=0)].T @ cell
+
+    images = (r[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
+    image_z = np.tile(z, len(shifts))
+
+    distance, _ = cKDTree(r).query(images, distance_upper_bound=cutoff)
+    inside = np.isfinite(distance)
+
+    return (
+        np.concatenate([z, image_z[inside]]),
+        np.concatenate([r, images[inside]]),
+        np.concatenate([np.zeros(len(z)), distance[inside]]),
+    )
+
+
+def _store(fingerprint, entry):
+    global _size
+
+    if fingerprint in _memo:
+        _size -= _nbytes(_memo.pop(fingerprint))
+
+    if _nbytes(entry) > max_bytes:
+        return
+
+    _memo[fingerprint] = entry
+    _size += _nbytes(entry)
+
+    while _size > max_bytes:
+        _, dropped = _memo.popitem(last=False)
+        _size -= _nbytes(dropped)
+
+
+def _nbytes(entry):
+    return sum(array.nbytes for array in entry[1:])
+
+
+def clear():
+    """Forget all cached environments."""
+    global _size
+
+    _memo.clear()
+    _size = 0
@@ -0,0 +1,166 @@
+"""Parallel computation, writing into a shared output buffer.
+
+When dscribe parallelises with n_jobs, the results of each worker are
+pickled back to the parent process and then concatenated, so the output
+briefly exists twice. Here, the flat output is instead preallocated as a
+memory-mapped file in shared memory (/dev/shm, where available and large
+enough, otherwise in the temporary directory), from the number of rows of
+each system. Each worker computes a group of systems and
+writes their rows straight into the buffer, so nothing but the dataset is
+sent between processes, and the parent can use the buffer as-is
+(for instance, to_local wraps it without copying).
+
+Systems are grouped by their estimated cost and handed out longest-first,
+see schedule.py.
+
+The file is removed once all workers are done; the mapping in the parent
+stays valid until it is garbage collected.
+
+Sparse output can not be preallocated, and is always computed by dscribe.
+
+With n_jobs="auto", the number of workers is chosen by auto_n_jobs.
+
+"""
+
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from cmlkit.dataset import Subset
+
+from .containers import _rows
+from .estimate import RAW_DTYPE
+from . import schedule
+
+# starting a worker process costs a fraction of a second, so each
+# worker should get at least this much work (in estimated seconds)
+min_seconds_per_job = 1.0
+
+
+def create(component, data, n_jobs):
+    """Compute the flat dscribe output of component for data, with n_jobs processes.
+
+    Args:
+        component: cscribe Representation
+        data: Dataset
+        n_jobs: Number of worker processes
+
+    Returns:
+        np.memmap of shape (rows, raw dim), where rows is the number of
+        atoms for local representations, or systems otherwise.
+
+    """
+    counts = component._rows_by_system(data)
+    offsets = np.zeros(data.n + 1, dtype=int)
+    offsets[1::] = np.cumsum(counts)
+
+    shape = (int(offsets[-1]), component._raw_dim())
+
+    dtype = component._dtype(default=RAW_DTYPE)
+
+    if shape[0] * shape[1] == 0:
+        return np.zeros(shape, dtype=dtype)
+
+    tasks = schedule.tasks(
+        schedule.costs(data, cutoff=component._cutoff()), n_jobs=n_jobs
+    )
+
+    n_bytes = shape[0] * shape[1] * np.dtype(dtype).itemsize
+    fd, path = tempfile.mkstemp(
+        prefix="cscribe-", suffix=".bin", dir=_shared_dir(n_bytes)
+    )
+    os.close(fd)
+
+    try:
+        buffer = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+
+        # the pool hands out tasks in the order they are submitted
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            futures = [
+                pool.submit(
+                    _work,
+                    component,
+                    Subset.from_dataset(data, idx=idx),
+                    path,
+                    shape,
+                    dtype,
+                    _rows(offsets, idx),
+                )
+                for idx in tasks
+            ]
+
+            for future in futures:
+                future.result()
+    finally:
+        os.unlink(path)
+
+    return buffer
+
+
+def _work(component, data, path, shape, dtype, rows):
+    # this is a copy of the component, so we can change its context
+    component.context["engine"] = "dscribe"
+    component.context["n_jobs"] = 1
+
+    rep = component._create(data)
+
+    buffer = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+    buffer[rows] = rep
+    buffer.flush()
+
+
+def _shared_dir(n_bytes):
+    """Directory for a buffer of n_bytes, preferring shared memory.
+
+    Writing to a memory-mapped file beyond the free space of its file system
+    crashes the writing process with SIGBUS, so we only use /dev/shm (which
+    is usually limited to half the memory) if the buffer fits, and otherwise
+    the regular temporary directory.
+
+    """
+    for directory in ["/dev/shm", tempfile.gettempdir()]:
+        if os.path.isdir(directory) and _free_bytes(directory) >= n_bytes:
+            return directory
+
+    raise MemoryError(
+        f"Not enough space for a shared buffer of {n_bytes} bytes "
+        f"in /dev/shm or {tempfile.gettempdir()}."
+    )
+
+
+def _free_bytes(directory):
+    stats = os.statvfs(directory)
+    return stats.f_bavail * stats.f_frsize
+
+
+def auto_n_jobs(seconds, n_systems, cores=None):
+    """Choose the number of workers for a job.
+
+    Uses as many workers as there are available cores, but not more than
+    there are systems, and only as many as can be kept busy for at least
+    min_seconds_per_job each.
+
+    Args:
+        seconds: Estimated runtime on one core (see estimate)
+        n_systems: Number of systems to compute
+        cores: Number of available cores, by default determined automatically
+
+    Returns:
+        Number of workers (at least 1)
+
+    """
+    if cores is None:
+        cores = available_cores()
+
+    by_work = int(seconds // min_seconds_per_job)
+
+    return max(min(cores, n_systems, by_work), 1)
+
+
+def available_cores():
+    """Number of cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
@@ -0,0 +1,101 @@
+"""Per-stage timing and memory instrumentation.
+
+If the profile context setting of a component is set, each stage of a
+computation is measured, and the results are accumulated in the stats
+attribute of the component, keyed by stage:
+
+    calls: Number of times the stage was run
+    seconds: Total wall time
+    rss: Total growth of the peak resident set size of the process, in bytes
+    bytes: Total size of the output of the stage, in bytes
+
+The stages are:
+
+    atoms: Converting the dataset to dscribe systems (or finite environments)
+    descriptor: Setting up the dscribe descriptor (memoized, see descriptors.py)
+    create: Computing the dscribe output
+    transform: Selecting columns and casting the dscribe output
+    arrange: Converting it to the final representation, which consists of
+    to_local: Splitting the flat output into one block of rows per system
+    in_blocks: Zero-padding the rows into one block per element (stratify=True)
+    by_element: Splitting the rows into one matrix per element ("elements")
+    compute: Everything, including caches and chunking
+
+Since the peak RSS can only grow, rss is the amount by which a stage raised
+the high-water mark of memory use, not the memory it used: a stage that
+stays below an earlier peak reports 0. Work done in other processes
+(n_jobs > 1) is only included in seconds.
+
+When profile is not set, stages are called directly, and nothing is measured.
+
+"""
+
+import sys
+import time
+import resource
+import scipy.sparse as sp
+
+
+def measure(stats, name, function, *args, callback=None, **kwargs):
+    """Call function(*args, **kwargs), and add its measurements to stats[name].
+
+    Args:
+        stats: dict of stage name -> measurements, updated in place
+        name: Name of the stage
+        function: Function to call
+        callback: Function (name, measurements) called after the stage, or None
+
+    Returns:
+        Result of function
+
+    """
+    rss = peak_rss()
+    start = time.perf_counter()
+
+    result = function(*args, **kwargs)
+
+    measurements = {
+        "calls": 1,
+        "seconds": time.perf_counter() - start,
+        "rss": peak_rss() - rss,
+        "bytes": nbytes(result),
+    }
+
+    if name in stats:
+        for key, value in measurements.items():
+            stats[name][key] += value
+    else:
+        stats[name] = dict(measurements)
+
+    if callback is not None:
+        callback(name, measurements)
+
+    return result
+
+
+def peak_rss():
+    """Peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports KiB, macos bytes
+    if sys.platform == "darwin":
+        return peak
+    else:
+        return peak * 1024
+
+
+def nbytes(rep):
+    """Size of the arrays in rep, in bytes (0 for anything else)."""
+    if sp.issparse(rep):
+        rep = rep.tocsr()
+        return rep.data.nbytes + rep.indices.nbytes + rep.indptr.nbytes
+    elif hasattr(rep, "blocks"):
+        # ByElement
+        return sum(nbytes(block) for block in rep.blocks.values())
+    elif hasattr(rep, "offsets"):
+        # Ragged
+        return nbytes(rep.data)
+    elif hasattr(rep, "nbytes") and getattr(rep, "dtype", None) != object:
+        return int(rep.nbytes)
+    else:
+        return 0
@@ -0,0 +1,208 @@
+"""Linear projection of descriptors onto fewer dimensions.
+
+MBTR with k=3, or SOAP with large l_max, produce tens of thousands of
+features, while most of the variance is captured by a few hundred
+directions. A projection, fitted once (see Representation.projected),
+is applied to the flat dscribe output of each chunk right after column
+selection, so the full-width output never exists for the whole dataset.
+
+Projections are described by a config, which is stored as the projection
+entry of the component config:
+
+    {"random": {"n_features": d, "dim": k, "seed": s}}
+        Very sparse random projection (Li, Hastie and Church, KDD 2006):
+        entries are +-sqrt(sqrt(d) / k) with probability 1 / (2 sqrt(d)) each,
+        and 0 otherwise. The matrix is regenerated from the seed, so the
+        config is all that needs to be stored.
+
+    {"pca": {"dim": k, "file": path, "hash": h}}
+        Principal components, fitted with randomized SVD (Halko, Martinsson and
+        Tropp, 2011) on a sample. The mean and the components are stored in a
+        .npz file, whose content hash is part of the config, so caches notice
+        if it changes.
+
+Set up projections are memoized, like the dscribe descriptors.
+
+"""
+
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+from cmlkit.engine import compute_hash, parse_config
+
+max_entries = 8
+
+_memo = OrderedDict()
+
+
+def get(config):
+    """Return the (memoized) Projection described by config."""
+    key = compute_hash(config)
+
+    if key in _memo:
+        _memo.move_to_end(key)
+        return _memo[key]
+
+    kind, inner = parse_config(config)
+    if kind == "random":
+        projection = random_projection(**inner)
+    elif kind == "pca":
+        projection = load_pca(**inner)
+    else:
+        raise ValueError(f"Unknown projection {kind}. (Allowed: random and pca.)")
+
+    _memo[key] = projection
+    while len(_memo) > max_entries:
+        _memo.popitem(last=False)
+
+    return projection
+
+
+def dim(config):
+    """Number of dimensions after projecting with config."""
+    kind, inner = parse_config(config)
+
+    return inner["dim"]
+
+
+class Projection:
+    """Affine map x -> x @ matrix - offset.
+
+    Attributes:
+        matrix: ndarray or scipy.sparse matrix, n_features x dim
+        offset: ndarray of length dim, or None
+
+    """
+
+    def __init__(self, matrix, offset=None):
+        self.matrix = matrix
+        self.offset = offset
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def apply(self, rep):
+        """Project rep (dense or sparse, n x n_features), returning a dense array."""
+        dtype = rep.dtype
+        matrix = self.matrix.astype(dtype)
+
+        result = rep @ matrix
+        if sp.issparse(result):
+            result = result.toarray()
+        result = np.asarray(result, dtype=dtype)
+
+        if self.offset is not None:
+            result -= self.offset.astype(dtype)
+
+        return result
+
+
+def random_config(n_features, dim, seed=0):
+    """Config of a sparse random projection from n_features onto dim."""
+    if dim > n_features:
+        raise ValueError(f"Can not project {n_features} features onto {dim}.")
+
+    return {"random": {"n_features": int(n_features), "dim": int(dim), "seed": seed}}
+
+
+def random_projection(n_features, dim, seed=0):
+    """Very sparse random projection, see module docstring."""
+    rng = np.random.RandomState(seed)
+    density = 1 / np.sqrt(n_features)
+
+    indices = []
+    indptr = [0]
+    for j in range(dim):
+        n = rng.binomial(n_features, density)
+        indices.append(rng.choice(n_features, n, replace=False))
+        indptr.append(indptr[-1] + n)
+
+    signs = rng.randint(2, size=indptr[-1]) * 2 - 1
+    values = signs * np.sqrt(1 / density) / np.sqrt(dim)
+
+    matrix = sp.csc_matrix(
+        (values, np.concatenate(indices).astype(int), indptr),
+        shape=(n_features, dim),
+    )
+
+    return Projection(matrix.tocsr())
+
+
+def fit_pca(rep, dim, path, seed=0, n_iter=4, oversampling=10):
+    """Fit principal components to rep, save them to path, and return the config.
+
+    Args:
+        rep: Sample of the flat output (dense or sparse), n x n_features
+        dim: Number of components
+        path: File to store mean and components in (.npz)
+        seed: Seed for the random starting basis
+        n_iter: Number of power iterations
+        oversampling: Number of additional directions in the starting basis
+
+    Returns:
+        Projection config
+
+    """
+    if sp.issparse(rep):
+        rep = rep.toarray()
+    rep = np.asarray(rep, dtype=np.float64)
+
+    if dim > min(rep.shape):
+        raise ValueError(
+            f"Can not fit {dim} components to a sample of shape {rep.shape}."
+        )
+
+    mean = rep.mean(axis=0)
+    centered = rep - mean
+
+    rng = np.random.RandomState(seed)
+    basis = rng.normal(size=(rep.shape[1], min(dim + oversampling, min(rep.shape))))
+
+    q, _ = np.linalg.qr(centered @ basis)
+    for i in range(n_iter):
+        q, _ = np.linalg.qr(centered.T @ q)
+        q, _ = np.linalg.qr(centered @ q)
+
+    _, _, vt = np.linalg.svd(q.T @ centered, full_matrices=False)
+    components = vt[:dim]
+
+    path = Path(path)
+    if path.suffix != ".npz":
+        path = path.with_suffix(".npz")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, mean=mean, components=components)
+
+    return {"pca": {"dim": int(dim), "file": str(path), "hash": _hash(path)}}
+
+
+def load_pca(dim, file, hash):
+    """Projection onto the principal components stored in file."""
+    if _hash(file) != hash:
+        raise ValueError(f"Contents of {file} do not match the projection config.")
+
+    with np.load(file) as stored:
+        mean = stored["mean"]
+        components = stored["components"]
+
+    matrix = np.ascontiguousarray(components.T)
+
+    return Projection(matrix, offset=mean @ matrix)
+
+
+def clear():
+    """Forget all memoized projections."""
+    _memo.clear()
+
+
+def _hash(path):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+
+    return h.hexdigest()
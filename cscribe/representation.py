@@ -0,0 +1,834 @@
+"""Base class for cscribe representations."""
+
+import shutil
+import numpy as np
+import scipy.sparse as sp
+from pathlib import Path
+
+from cmlkit import logger
+from cmlkit.engine import compute_hash
+from cmlkit.dataset import Subset
+from cmlkit.representation import Representation as BaseRepresentation
+from cmlkit.representation.data import AtomicRepresentation, atomic_data_dict
+
+from .cache import DescriptorCache, SystemCache, fingerprints
+from .conversion import (
+    by_element,
+    center_indices,
+    check_stratify,
+    in_blocks,
+    to_local,
+)
+from .containers import Ragged, concatenate, _rows
+from . import storage
+from . import descriptors
+from . import parallel
+from . import neighbours
+from . import profile
+from . import systems
+from . import projection
+from . import schedule
+from .estimate import estimate, RAW_DTYPE, STRATIFIED_ITEMSIZE
+
+# default size of the output of each chunk, if it has to be chunked anyway
+CHUNK_BYTES = 2**28
+
+
+class Representation(BaseRepresentation):
+    """Base class for the dscribe-backed representations.
+
+    Subclasses implement `_descriptor(periodic)`, which sets up the dscribe
+    descriptor (it is memoized, see descriptors.py), and optionally
+    `_arrange(data, rep)`, which converts the flat dscribe output
+    (one row per atom for local representations, one row per system
+    otherwise, as indicated by the `local` class attribute) into the final
+    representation.
+
+    Local representations can be restricted to some atoms with the centers
+    config entry (see conversion.center_indices), in which case only these
+    atoms are passed to dscribe as positions, and the output only has rows
+    for them; _arrange must then pass _centers(data) on to the conversion.
+
+    This class wraps these steps with the functionality that is shared
+    between all representations, which is configured through the context:
+
+        cache: Directory of the on-disk descriptor cache, or None (default).
+            Results are stored under a hash of kind, config and the geometries
+            in the dataset, and are loaded memory-mapped on later calls.
+        cache_size: Maximum size of the cache in bytes, default 16GiB.
+            Least recently used entries are removed once this is exceeded.
+        system_cache: Directory of the per-system cache, or None (default).
+            The dscribe output of each system is stored under a fingerprint of
+            its geometry, so only systems that have not been seen before are
+            computed, and duplicated systems are computed only once.
+        chunk_size: Number of systems to compute at once, or None (default).
+        chunk_bytes: Approximate size of the output of each chunk in bytes,
+            or None (default). If either this or chunk_size is set, the
+            dataset is computed chunk by chunk (see compute_iter), and the
+            results are copied into the final output as they arrive,
+            so only one chunk at a time is passed through dscribe.
+            If a projection is set, chunks of 256MiB are used by default, as
+            the dscribe output is only projected once a chunk is computed.
+        output: Directory to write the output to, or None (default).
+            The output is written to output/data.id/key, where key is a hash
+            of kind, config and dtype, and loaded from there (memory-mapped)
+            if it has been computed before. Dense and Ragged output is
+            preallocated as memory-mapped .npy file, filled chunk by chunk
+            (256MiB by default), and returned memory-mapped; for local
+            representations, the offsets are written alongside. Sparse and
+            ByElement output is assembled in memory before it is written, so
+            only dense and Ragged output is computed out of core.
+            See storage.load for reading it back later.
+        n_jobs: Number of processes, or "auto" to choose it from the estimated
+            runtime, the number of systems and the available cores
+            (see parallel.auto_n_jobs). The number used in the last
+            computation is stored in the chosen_n_jobs attribute.
+        engine: How to parallelise over n_jobs processes. With "dscribe"
+            (default), dscribe's own parallelisation is used; it splits the
+            systems into n_jobs contiguous parts of equal length, so they are
+            reordered beforehand to give each part a similar estimated cost
+            (see schedule.order). With "shared", the output is preallocated
+            in shared memory, the workers write their part directly into it,
+            and tasks are handed out to whichever worker is free,
+            see parallel.py.
+        neighbour_cache: Whether to compute periodic systems from cached finite
+            environments, default False. These contain the unit cell and all
+            periodic images within the cutoff, are built once per system, and
+            are shared between components and cutoffs, up to a memory limit,
+            see neighbours.py. Only SOAP and SymmetryFunctions support this.
+        input: How structures are passed to dscribe. With "arrays" (default),
+            dscribe System objects are built directly from the arrays of the
+            dataset, see systems.py. With "ase", data.as_Atoms() is used,
+            which dscribe then converts itself.
+        dtype: dtype of the output, for instance "float32", or None (default)
+            to keep the dtype returned by dscribe (float32 at the time of writing),
+            and float64 for zero-padded element blocks. The dscribe output
+            is cast once, right after it is computed (or written directly with
+            this dtype by the shared engine), and everything downstream,
+            including caches and memory-mapped output, keeps it.
+        max_bytes: Maximum size of the output in bytes, or None (default).
+            If the output would be larger than this (see estimate), a
+            MemoryError is raised before anything is computed, unless output
+            is set. For sparse output, the size of the dense equivalent is used.
+        profile: Whether to measure wall time, peak memory and output size
+            of each stage of compute, default False. The measurements of the
+            last call to compute are stored in the stats attribute, see
+            profile.py. If a function (stage, measurements) is given,
+            it is also called after each stage.
+
+    """
+
+    local = True
+
+    def __init__(self, context={}):
+        # can't use default_context because subclasses overwrite it
+        context = {
+            "cache": None,
+            "cache_size": 2**34,
+            "system_cache": None,
+            "chunk_bytes": None,
+            "output": None,
+            "max_bytes": None,
+            "engine": "dscribe",
+            "neighbour_cache": False,
+            "input": "arrays",
+            "dtype": None,
+            "profile": False,
+            **context,
+        }
+        super().__init__(context=context)
+
+        if self.context["engine"] not in ["dscribe", "shared"]:
+            engine = self.context["engine"]
+            raise ValueError(f"Unknown engine {engine}. (Allowed: dscribe and shared.)")
+
+        if self.context["input"] not in ["arrays", "ase"]:
+            kind = self.context["input"]
+            raise ValueError(f"Unknown input {kind}. (Allowed: arrays and ase.)")
+
+        dtype = self.context["dtype"]
+        if dtype is not None and not np.issubdtype(np.dtype(dtype), np.floating):
+            raise ValueError(f"dtype must be a floating point type, not {dtype}.")
+
+        # cmlkit's __call__ would compute each chunk on its own, and join them
+        # with np.concatenate, so we hand it None and chunk in compute instead
+        chunk_size = self.context["chunk_size"]
+        if chunk_size is not None or "chunk_systems" not in self.context:
+            self.context["chunk_systems"] = chunk_size
+        self.context["chunk_size"] = None
+
+        # set on each computation, see _n_jobs
+        self.chosen_n_jobs = None
+
+        # filled on each computation if profile is set, see _stage
+        self.stats = {}
+
+    def compute(self, data):
+        """Compute this representation, returning the cscribe container.
+
+        Calling the component instead goes through cmlkit, which wraps the
+        result into its Data classes, see to_data.
+
+        """
+        self._check_size(data)
+
+        self.stats = {}
+        return self._stage("compute", self._compute_cached, data)
+
+    def to_data(self, data, rep):
+        """Wrap the output of compute for cmlkit.
+
+        Ragged output is passed on as the linear array of an AtomicRepresentation,
+        without the per-system copies of cmlkit's from_ragged, and with the
+        number of rows of each system (which differ from the number of atoms if
+        centers is set). ByElement output has no cmlkit counterpart, and is
+        returned as it is.
+
+        """
+        if hasattr(rep, "blocks"):
+            return rep
+        elif isinstance(rep, Ragged):
+            return AtomicRepresentation.result(
+                data=atomic_data_dict(rep.counts, rep.data),
+                inputs=data,
+                component=self,
+            )
+        else:
+            return super().to_data(data, rep)
+
+    def _compute_cached(self, data):
+        if self.context["cache"] is None:
+            return self._compute(data)
+
+        cache = DescriptorCache(
+            self.context["cache"], max_bytes=self.context["cache_size"]
+        )
+        extra = self._key_extra(data)
+        key = cache.key(self.get_kind(), self._cache_config(), data, *extra)
+
+        rep = cache.get(key)
+        if rep is None:
+            rep = self._compute(data)
+            cache.put(key, rep)
+
+        return rep
+
+    def _key_extra(self, data):
+        """What determines the output besides kind, config and geometries."""
+        # the geometry hash ignores properties, which can select centers
+        extra = []
+        if self.context["dtype"] is not None:
+            extra.append(str(self._dtype()))
+        if isinstance(self._get_config().get("centers", None), str):
+            extra.append(fingerprints(data, centers=self._centers(data)).tolist())
+
+        return extra
+
+    def compute_iter(self, data, chunk_size=None, chunk_bytes=None):
+        """Compute representation in chunks.
+
+        Only one chunk at a time is converted to ase.Atoms and computed,
+        so memory use is bounded by the chunk size.
+
+        Args:
+            data: Dataset
+            chunk_size: Number of systems per chunk
+            chunk_bytes: Approximate size of the output of each chunk,
+                in bytes. Ignored if chunk_size is given. If neither is
+                given, the values from the context are used.
+
+        Returns:
+            Iterator over the representations of consecutive chunks,
+            each computed as if the chunk was its own Dataset.
+
+        """
+        for chunk in self._chunks(data, chunk_size=chunk_size, chunk_bytes=chunk_bytes):
+            yield self._compute_single(chunk)
+
+    def pruned(self, data, tol=0.0):
+        """Copy of this representation that drops columns which are zero on data.
+
+        The columns of the dscribe output (i.e. before stratification) whose
+        absolute value never exceeds tol on data are dropped. The kept columns
+        are stored as the columns entry of the config, so the copy returns the
+        same columns for any data, and can be saved and restored as usual.
+
+        Args:
+            data: Reference dataset, for instance the training set
+            tol: Columns with absolute values up to this are considered zero
+
+        Returns:
+            Representation of the same kind, with columns set
+
+        """
+        if self._projection() is not None:
+            raise ValueError("Columns must be pruned before projecting.")
+
+        maximum = np.zeros(self._raw_dim())
+        for chunk in self._chunks(data):
+            rep = self._create(chunk)
+            if sp.issparse(rep):
+                chunk_maximum = abs(rep).max(axis=0).toarray().ravel()
+            else:
+                chunk_maximum = np.abs(rep).max(axis=0, initial=0.0)
+
+            maximum = np.maximum(maximum, chunk_maximum)
+
+        columns = [int(i) for i in np.flatnonzero(maximum > tol)]
+
+        return type(self)(
+            **{**self._get_config(), "columns": columns}, context=self.context
+        )
+
+    def projected(self, data, dim, method="random", path=None, n_sample=1000, seed=0):
+        """Copy of this representation that projects its output onto dim dimensions.
+
+        The flat dscribe output (after column selection) is projected chunk
+        by chunk, before stratification, see projection.py. The projection
+        is stored as the projection entry of the config, so the copy projects
+        any data in the same way, and can be saved and restored as usual.
+
+        Args:
+            data: Dataset to fit on (ignored for random projections)
+            dim: Number of dimensions to project onto
+            method: "random" (default) for a sparse random projection,
+                or "pca" for principal components fitted on data
+            path: File to store the principal components in (required for pca)
+            n_sample: Maximum number of systems of data to fit on
+            seed: Seed for the random projection, and the selection of the sample
+
+        Returns:
+            Representation of the same kind, with projection set
+
+        """
+        if self._projection() is not None:
+            raise ValueError(f"{self.get_kind()} is already projected.")
+
+        if method == "random":
+            config = projection.random_config(self._dim_unprojected(), dim, seed=seed)
+        elif method == "pca":
+            if path is None:
+                raise ValueError("pca needs a path to store the components in.")
+
+            if data.n > n_sample:
+                rng = np.random.RandomState(seed)
+                idx = np.sort(rng.choice(data.n, n_sample, replace=False))
+                data = Subset.from_dataset(data, idx=idx)
+
+            parts = [
+                self._select_columns(self._create(chunk))
+                for chunk in self._chunks(data)
+            ]
+            if sp.issparse(parts[0]):
+                sample = sp.vstack(parts, format="csr")
+            else:
+                sample = np.concatenate(parts, axis=0)
+
+            config = projection.fit_pca(sample, dim, path, seed=seed)
+        else:
+            raise ValueError(f"Unknown method {method}. (Allowed: random and pca.)")
+
+        return type(self)(
+            **{**self._get_config(), "projection": config}, context=self.context
+        )
+
+    def estimate(self, data):
+        """Estimate the size of the output, and the runtime, without computing.
+
+        Args:
+            data: Dataset, or the number of atoms in each system
+
+        Returns:
+            dict with n_rows, dim, raw_dim, bytes, bytes_flat,
+            bytes_stratified and seconds, see estimate.estimate
+
+        """
+        return estimate(self, data)
+
+    def _check_size(self, data):
+        max_bytes = self.context["max_bytes"]
+        if max_bytes is None or self.context["output"] is not None:
+            return
+
+        n_bytes = self._n_rows(data) * self._row_bytes()
+        if n_bytes > max_bytes:
+            raise MemoryError(
+                f"Output of {self.get_kind()} would need {n_bytes} bytes, "
+                f"more than max_bytes={max_bytes}."
+            )
+
+    def _compute(self, data):
+        if self.context["output"] is not None:
+            return self._compute_to_disk(data, self.context["output"])
+
+        chunk_size = self.context["chunk_systems"]
+        chunk_bytes = self.context["chunk_bytes"]
+        if chunk_size is None and chunk_bytes is None:
+            if self._projection() is None:
+                return self._compute_single(data)
+
+            # otherwise, the full-width output of the whole dataset
+            # would exist before it is projected
+            chunk_bytes = CHUNK_BYTES
+
+        return concatenate(
+            self.compute_iter(data, chunk_size=chunk_size, chunk_bytes=chunk_bytes),
+            n_rows=self._n_rows(data),
+        )
+
+    def _compute_to_disk(self, data, directory):
+        # each dataset and component gets its own directory, so earlier
+        # results, which may still be memory-mapped, are never overwritten
+        directory = self._output_directory(data, directory)
+        if (directory / "meta.json").is_file():
+            return storage.load(directory, mmap_mode="r")
+        elif directory.exists():
+            # left behind by an interrupted computation
+            shutil.rmtree(directory)
+
+        # dense output is written straight into a memory-mapped .npy file,
+        # which is laid out so that storage.load can read it back
+        if self.local:
+            array_directory = directory / "data"
+        else:
+            array_directory = directory
+
+        def allocate(shape, dtype):
+            return storage.allocate(array_directory, shape, dtype)
+
+        chunk_size = self.context["chunk_systems"]
+        chunk_bytes = self.context["chunk_bytes"]
+        if chunk_size is None and chunk_bytes is None:
+            chunk_bytes = CHUNK_BYTES
+
+        rep = concatenate(
+            self.compute_iter(data, chunk_size=chunk_size, chunk_bytes=chunk_bytes),
+            n_rows=self._n_rows(data),
+            allocate=allocate,
+        )
+        storage.save(directory, rep)
+        del rep
+
+        return storage.load(directory, mmap_mode="r")
+
+    def _output_directory(self, data, output):
+        """Directory in output that the output for data is written to."""
+        extra = self._key_extra(data)
+        key = compute_hash(self.get_kind(), self._cache_config(), *extra)
+
+        return Path(output) / data.id / key
+
+    def _compute_single(self, data):
+        if self.context["system_cache"] is None:
+            rep = self._create(data)
+        else:
+            rep = self._create_incremental(data)
+
+        rep = self._stage("transform", self._transform, rep)
+
+        return self._stage("arrange", self._arrange, data, rep)
+
+    def _chunks(self, data, chunk_size=None, chunk_bytes=None):
+        if chunk_size is None and chunk_bytes is None:
+            chunk_size = self.context["chunk_systems"]
+            chunk_bytes = self.context["chunk_bytes"]
+
+        if chunk_size is not None:
+            bounds = np.arange(0, data.n, chunk_size)
+        elif chunk_bytes is not None:
+            # add systems to each chunk while its output fits into chunk_bytes,
+            # but at least one system
+            rows = np.cumsum(self._rows_by_system(data))
+            per_chunk = max(chunk_bytes // max(self._chunk_row_bytes(), 1), 1)
+
+            bounds = []
+            start = 0
+            while start < data.n:
+                done = rows[start - 1] if start > 0 else 0
+                stop = np.searchsorted(rows, done + per_chunk, side="right")
+                start = max(int(stop), start + 1)
+                bounds.append(start)
+
+            bounds = np.array(bounds, dtype=int)
+        else:
+            bounds = np.zeros(0, dtype=int)
+
+        bounds = np.unique(np.concatenate([[0], bounds, [data.n]]))
+
+        if len(bounds) == 2:
+            yield data
+        else:
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                yield Subset.from_dataset(data, idx=np.arange(start, stop))
+
+    def _create_incremental(self, data):
+        cache = SystemCache(
+            self.context["system_cache"], self.get_kind(), self._cache_config()
+        )
+
+        prints = fingerprints(data, centers=self._centers(data))
+        unique, first, inverse = np.unique(
+            prints, return_index=True, return_inverse=True
+        )
+
+        outputs = [cache.get(p) for p in unique]
+        missing = np.array([i for i, o in enumerate(outputs) if o is None], dtype=int)
+
+        if len(missing) > 0:
+            # compute in dataset order, so we can skip the subset if possible
+            missing = missing[np.argsort(first[missing])]
+
+            if len(missing) == data.n:
+                todo = data
+            else:
+                todo = Subset.from_dataset(data, idx=first[missing])
+
+            for i, output in zip(missing, self._split(todo, self._create(todo))):
+                cache.put(unique[i], output)
+                outputs[i] = output
+
+        ordered = [outputs[i] for i in inverse]
+        if sp.issparse(ordered[0]):
+            return sp.vstack(ordered, format="csr")
+        else:
+            return np.concatenate(ordered, axis=0)
+
+    def _split(self, data, rep):
+        """Split flat dscribe output into the rows belonging to each system."""
+        counts = self._rows_by_system(data)
+
+        offsets = np.zeros(len(counts) + 1, dtype=int)
+        offsets[1::] = np.cumsum(counts)
+
+        return [rep[offsets[i] : offsets[i + 1]] for i in range(data.n)]
+
+    def _rows_by_system(self, data):
+        if not self.local:
+            return np.ones(data.n, dtype=int)
+
+        centers = self._centers(data)
+        if centers is None:
+            return data.info["atoms_by_system"]
+        else:
+            return np.array([len(c) for c in centers], dtype=int)
+
+    def _centers(self, data):
+        """Indices of the atoms to compute in each system, or None for all."""
+        if self.local:
+            return center_indices(data, self._get_config().get("centers", None))
+        else:
+            return None
+
+    def _n_rows(self, data):
+        return int(np.sum(self._rows_by_system(data)))
+
+    def _raw_dim(self):
+        """Width of each row of the dscribe output."""
+        return self._get_descriptor(periodic=False).get_number_of_features()
+
+    def _dim(self):
+        """Width of each row of the output."""
+        return self._flat_dim()
+
+    def _flat_dim(self):
+        """Width of each row of the flat output, after columns and projection."""
+        config = self._projection()
+        if config is None:
+            return self._dim_unprojected()
+        else:
+            return projection.dim(config)
+
+    def _dim_unprojected(self):
+        """Width of each row of the output before projection."""
+        columns = self._columns()
+        if columns is None:
+            return self._raw_dim()
+        else:
+            return len(columns)
+
+    def _projection(self):
+        """Config of the projection applied to the output, or None."""
+        return self._get_config().get("projection", None)
+
+    def _columns(self):
+        """Columns of the dscribe output to keep, or None for all."""
+        return self._get_config().get("columns", None)
+
+    def _transform(self, rep):
+        """Select columns, project and cast the flat dscribe output."""
+        rep = self._select_columns(rep)
+
+        config = self._projection()
+        if config is not None:
+            rep = projection.get(config).apply(rep)
+
+        dtype = self._dtype()
+        if dtype is None or rep.dtype == dtype:
+            return rep
+        elif sp.issparse(rep):
+            return rep.astype(dtype)
+        else:
+            return rep.astype(dtype, copy=False)
+
+    def _dtype(self, default=None):
+        """dtype of the output set in the context, or default if not set."""
+        dtype = self.context["dtype"]
+        if dtype is None:
+            return default
+        else:
+            return np.dtype(dtype)
+
+    def _select_columns(self, rep):
+        columns = self._columns()
+        if columns is None:
+            return rep
+        else:
+            return rep[:, columns]
+
+    def _itemsize(self):
+        """Size of each entry of the output, in bytes."""
+        return self._dtype(default=RAW_DTYPE).itemsize
+
+    def _row_bytes(self):
+        return self._dim() * self._itemsize()
+
+    def _chunk_row_bytes(self):
+        """Size of each row while a chunk is computed, in bytes."""
+        if self._projection() is None:
+            return self._row_bytes()
+
+        # the dscribe output is projected only after it is computed
+        return max(self._row_bytes(), self._raw_dim() * RAW_DTYPE.itemsize)
+
+    def _create(self, data):
+        centers = self._centers(data)
+        if centers is not None and min(len(c) for c in centers) == 0:
+            # systems without centers have no rows, and dscribe needs
+            # at least one position per system
+            idx = np.flatnonzero([len(c) > 0 for c in centers])
+            if len(idx) == 0:
+                return self._empty()
+
+            data = Subset.from_dataset(data, idx=idx)
+
+        n_jobs = self._n_jobs(data)
+        if self.context["engine"] == "shared" and n_jobs > 1 and not self._sparse():
+            return self._stage("create", parallel.create, self, data, n_jobs)
+
+        if n_jobs > 1:
+            return self._create_balanced(data, n_jobs)
+
+        return self._create_dscribe(data, n_jobs)
+
+    def _create_balanced(self, data, n_jobs):
+        """_create_dscribe, with the systems reordered so each job has similar cost."""
+        order = schedule.order(schedule.costs(data, cutoff=self._cutoff()), n_jobs)
+        if np.array_equal(order, np.arange(data.n)):
+            return self._create_dscribe(data, n_jobs)
+
+        rep = self._create_dscribe(Subset.from_dataset(data, idx=order), n_jobs)
+
+        offsets = np.zeros(data.n + 1, dtype=int)
+        offsets[1::] = np.cumsum(self._rows_by_system(data))
+
+        # row j of rep belongs to row rows[j] of the original order
+        rows = _rows(offsets, order)
+
+        if sp.issparse(rep):
+            return rep.tocsr()[np.argsort(rows)].asformat(rep.format)
+        else:
+            return rep[np.argsort(rows)]
+
+    def _create_dscribe(self, data, n_jobs):
+        periodic = data.b is not None
+        if (
+            periodic
+            and self.context["neighbour_cache"]
+            and self._environment_cutoff() is not None
+        ):
+            return self._create_from_environments(data, n_jobs)
+
+        atoms = self._stage("atoms", self._systems, data)
+        descriptor = self._stage("descriptor", self._get_descriptor, periodic)
+
+        return self._stage(
+            "create",
+            descriptor.create,
+            atoms,
+            **self._create_kwargs(data),
+            n_jobs=n_jobs,
+            verbose=self.context["verbose"],
+        )
+
+    def _create_from_environments(self, data, n_jobs):
+        def make_atoms():
+            environments = neighbours.environments(data, self._environment_cutoff())
+            return [systems.make(z, r) for z, r in environments]
+
+        atoms = self._stage("atoms", make_atoms)
+        descriptor = self._stage("descriptor", self._get_descriptor, False)
+
+        centers = self._centers(data)
+        if centers is None:
+            positions = [list(range(len(z))) for z in data.z]
+        else:
+            positions = [c.tolist() for c in centers]
+
+        return self._stage(
+            "create",
+            descriptor.create,
+            atoms,
+            positions=positions,
+            n_jobs=n_jobs,
+            verbose=self.context["verbose"],
+        )
+
+    def _systems(self, data):
+        """Structures in data, in the form given to dscribe."""
+        if self.context["input"] == "ase":
+            return data.as_Atoms()
+        else:
+            return systems.from_data(data)
+
+    def _stage(self, name, function, *args, **kwargs):
+        """Call function(*args, **kwargs), measuring it if profile is set."""
+        setting = self.context["profile"]
+        if not setting:
+            return function(*args, **kwargs)
+
+        callback = setting if callable(setting) else None
+
+        return profile.measure(
+            self.stats, name, function, *args, callback=callback, **kwargs
+        )
+
+    def _environment_cutoff(self):
+        """Radius of the environments needed for periodic systems, or None.
+
+        Returning None means that environments are not supported, and
+        periodic systems are passed to dscribe as they are.
+
+        """
+        return None
+
+    def _n_jobs(self, data):
+        """Number of workers to use for data, resolving n_jobs="auto"."""
+        n_jobs = self.context["n_jobs"]
+
+        if n_jobs == "auto":
+            seconds = self.estimate(data)["seconds"]
+            n_jobs = parallel.auto_n_jobs(seconds, data.n)
+            logger.debug(
+                f"Chose n_jobs={n_jobs} for {self.get_kind()} on {data.n} systems."
+            )
+
+        self.chosen_n_jobs = n_jobs
+
+        return n_jobs
+
+    def _cutoff(self):
+        """Cutoff radius, or None if there is none."""
+        return self._get_config().get("cutoff", None)
+
+    def _sparse(self):
+        """Whether the dscribe output is sparse."""
+        return self._get_config().get("sparse", False)
+
+    def _create_kwargs(self, data):
+        centers = self._centers(data)
+        if centers is None:
+            return {}
+        else:
+            return {"positions": [c.tolist() for c in centers]}
+
+    def _empty(self):
+        """dscribe output without any rows."""
+        shape = (0, self._raw_dim())
+        if self._sparse():
+            return sp.csr_matrix(shape, dtype=RAW_DTYPE)
+        else:
+            return np.zeros(shape, dtype=RAW_DTYPE)
+
+    def _get_descriptor(self, periodic):
+        """Memoized _descriptor, see descriptors.py."""
+        return descriptors.get(
+            self.get_kind(),
+            self._descriptor_config(),
+            periodic,
+            lambda: self._descriptor(periodic),
+        )
+
+    def _descriptor_config(self):
+        """Config that determines the descriptor, used to memoize it."""
+        return self._get_config()
+
+    def _cache_config(self):
+        """Config that determines the output, used in cache keys."""
+        config = self._get_config()
+        descriptor = self._descriptor_config()
+        if descriptor == config:
+            return config
+        else:
+            # for instance, MBTR's flatten is only part of the descriptor config
+            return {"config": config, "descriptor": descriptor}
+
+    def _descriptor(self, periodic):
+        raise NotImplementedError("Representations must implement _descriptor.")
+
+    def _arrange(self, data, rep):
+        return rep
+
+
+class Stratified:
+    """Mixin for local representations that are stratified by central element.
+
+    The config must have elems, stratify and sparse entries, and the flat
+    dscribe output is arranged with conversion.stratified accordingly.
+    Must come before Representation in the bases.
+
+    """
+
+    def _dim(self):
+        dim = super()._dim()
+        if self.config["stratify"] is True:
+            dim *= len(self.config["elems"])
+
+        return dim
+
+    def _itemsize(self):
+        blocks = self.config["stratify"] is True and not self.config["sparse"]
+        if blocks and self._dtype() is None:
+            return STRATIFIED_ITEMSIZE
+
+        return super()._itemsize()
+
+    def _arrange(self, data, rep):
+        # conversion.stratified, with each step measured as its own stage
+        stratify = self.config["stratify"]
+        check_stratify(stratify)
+
+        centers = self._centers(data)
+        local = self._stage("to_local", to_local, data, rep, centers=centers)
+
+        if stratify == "elements":
+            return self._stage(
+                "by_element",
+                by_element,
+                data,
+                local,
+                elems=self.config["elems"],
+                centers=centers,
+            )
+        elif stratify:
+            return self._stage(
+                "in_blocks",
+                in_blocks,
+                data,
+                local,
+                elems=self.config["elems"],
+                sparse=self.config["sparse"],
+                dtype=self._dtype(default=np.float64),
+                centers=centers,
+            )
+        else:
+            return local
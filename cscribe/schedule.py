@@ -0,0 +1,133 @@
+"""Cost-aware scheduling of systems onto worker processes.
+
+Splitting a dataset evenly by the number of systems works poorly if the
+systems differ a lot in size: a worker that gets all the large periodic
+cells finishes long after the others. Instead, the cost of each system is
+estimated as the number of atoms plus the number of neighbours of each atom
+within the cutoff, and systems are grouped into tasks of roughly equal cost,
+which are handed out longest-first to whichever worker is free.
+
+dscribe's own parallelisation can not be scheduled like this: it splits its
+input into n_jobs contiguous parts with (almost) the same number of systems.
+For it, order returns a permutation of the systems so that each of these
+parts has roughly the same cost.
+
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# number of tasks per worker; more tasks balance better, but cost overhead
+tasks_per_job = 4
+
+
+def costs(data, cutoff=None):
+    """Estimated relative cost of computing each system in data.
+
+    For finite systems, the neighbours within cutoff are counted exactly.
+    For periodic systems, they are estimated from the density of the unit cell,
+    which accounts for periodic images. Without cutoff (MBTR), all pairs of
+    atoms are counted, for periodic systems also those with the 26
+    neighbouring cells.
+
+    Args:
+        data: Dataset
+        cutoff: Cutoff radius, or None
+
+    Returns:
+        ndarray with one cost per system
+
+    """
+    result = np.zeros(data.n)
+
+    for i in range(data.n):
+        n_atoms = len(data.z[i])
+        periodic = data.b is not None
+
+        if cutoff is None:
+            neighbours = n_atoms * (n_atoms - 1)
+            if periodic:
+                neighbours += 26 * n_atoms * n_atoms
+        elif periodic:
+            volume = abs(np.linalg.det(data.b[i]))
+            sphere = 4.0 / 3.0 * np.pi * cutoff**3
+            neighbours = n_atoms * n_atoms / volume * sphere
+        else:
+            tree = cKDTree(data.r[i])
+            neighbours = tree.count_neighbors(tree, cutoff) - n_atoms
+
+        result[i] = n_atoms + neighbours
+
+    return result
+
+
+def tasks(costs, n_jobs):
+    """Group systems into tasks of similar cost, most expensive first.
+
+    Systems are sorted by cost and then collected into tasks until
+    each task reaches the average cost per task, so expensive systems end up
+    in tasks of their own, and small ones are batched together.
+
+    Args:
+        costs: Cost of each system (see costs)
+        n_jobs: Number of workers
+
+    Returns:
+        List of index arrays (each sorted), in the order they should be started
+
+    """
+    costs = np.asarray(costs, dtype=float)
+    target = costs.sum() / max(n_jobs * tasks_per_job, 1)
+
+    result = []
+    current = []
+    current_cost = 0.0
+    for i in np.argsort(-costs, kind="stable"):
+        current.append(i)
+        current_cost += costs[i]
+
+        if current_cost >= target:
+            result.append((current_cost, current))
+            current = []
+            current_cost = 0.0
+
+    if len(current) > 0:
+        result.append((current_cost, current))
+
+    result.sort(key=lambda t: -t[0])
+
+    return [np.sort(np.array(idx, dtype=int)) for _, idx in result]
+
+
+def order(costs, n_jobs):
+    """Order systems so that dscribe's contiguous split gives each job similar cost.
+
+    dscribe gives the first n % n_jobs jobs n // n_jobs + 1 systems, and the
+    others n // n_jobs. Systems are assigned most expensive first to the
+    cheapest job that still has room, and the jobs are then concatenated.
+
+    Args:
+        costs: Cost of each system (see costs)
+        n_jobs: Number of workers
+
+    Returns:
+        Index array, a permutation of the systems (each job sorted)
+
+    """
+    costs = np.asarray(costs, dtype=float)
+    n_jobs = max(min(n_jobs, len(costs)), 1)
+
+    k, m = divmod(len(costs), n_jobs)
+    room = np.array([k + 1 if j < m else k for j in range(n_jobs)])
+    total = np.zeros(n_jobs)
+    jobs = [[] for j in range(n_jobs)]
+
+    for i in np.argsort(-costs, kind="stable"):
+        open_jobs = np.flatnonzero(room > 0)
+        j = open_jobs[np.argmin(total[open_jobs])]
+
+        jobs[j].append(i)
+        total[j] += costs[i]
+        room[j] -= 1
+
+    return np.concatenate([np.sort(np.array(job, dtype=int)) for job in jobs])
@@ -1,15 +1,17 @@
 import numpy as np
 
-from cmlkit.representation import Representation
 from cmlkit.representation.sf.config import prepare_config
 from cmlkit.engine import parse_config
 
 from dscribe.descriptors import ACSF
 
-from .conversion import to_local, in_blocks
+from .representation import Representation, Stratified
+from .conversion import stratified, check_stratify
+from . import descriptors
+from . import systems
 
 
-class SymmetryFunctions(Representation):
+class SymmetryFunctions(Stratified, Representation):
     """Atom-Centered Symmetry Functions (with DScribe).
 
     Symmetry functions are an atomic representation,
@@ -68,14 +70,39 @@ class SymmetryFunctions(Representation):
         cutoff: Cutoff
         sfs: List of configs of SFs or configs of parametrization schemes
         stratify: Whether to arrange output in separate blocks depending on
-            central element type, default True
+            central element type, default True. With "elements", the output
+            is instead one matrix per central element (see conversion.by_element).
+        sparse: Whether to return the output as scipy.sparse.csr_matrix,
+            default False. With stratify=True, the zero-padding of the
+            blocks is then never stored.
+        columns: Indices of the columns of the dscribe output to keep, or None
+            (default) to keep all, see Representation.pruned.
+        projection: Config of a projection of the dscribe output onto fewer
+            dimensions, or None (default), see Representation.projected.
+        centers: Atoms to compute the representation for, or None (default) for
+            all. Either a list of elements, or the name of a property of the
+            dataset with the indices (or a boolean mask) of the selected atoms
+            in each system, see conversion.center_indices. Only rows for the
+            selected atoms are computed and returned.
 
     """
 
     kind = "ds_sf"
+    local = True
     default_context = {"verbose": False, "n_jobs": 1}
 
-    def __init__(self, elems, cutoff, sfs=[], stratify=True, context={}):
+    def __init__(
+        self,
+        elems,
+        cutoff,
+        sfs=[],
+        stratify=True,
+        sparse=False,
+        columns=None,
+        centers=None,
+        projection=None,
+        context={},
+    ):
         super().__init__(context=context)
 
         sfs_with_cutoff = []
@@ -84,47 +111,177 @@ class SymmetryFunctions(Representation):
             inner["cutoff"] = cutoff
             sfs_with_cutoff.append({kind: inner})
 
+        check_stratify(stratify)
+
         self.runner_config = prepare_config(
             elems=elems, elemental=[], universal=sfs_with_cutoff
         )
-        self.config = {"elems": elems, "sfs": sfs, "cutoff": cutoff, "stratify": stratify}
-
-    def compute(self, data):
-        return compute_symmfs(
-            data,
+        self.config = {
+            "elems": elems,
+            "sfs": sfs,
+            "cutoff": cutoff,
+            "stratify": stratify,
+            "sparse": sparse,
+            "columns": columns,
+            "centers": centers,
+            "projection": projection,
+        }
+
+    def _descriptor(self, periodic):
+        return make_acsf(
             elems=self.config["elems"],
             cutoff=self.config["cutoff"],
             sfs=self.runner_config["universal"],
-            n_jobs=self.context["n_jobs"],
-            verbose=self.context["verbose"],
-            stratify=self.config["stratify"],
+            sparse=self.config["sparse"],
+            periodic=periodic,
         )
 
+    def _environment_cutoff(self):
+        return self.config["cutoff"]
+
     def _get_config(self):
         return self.config
 
 
-def compute_symmfs(data, elems, cutoff, sfs, stratify=True, n_jobs=1, verbose=False):
-    g2_params, g4_params = make_params(sfs)
+def compute_batch(data, components):
+    """Compute several SymmetryFunctions that differ only in their sfs at once.
+
+    The union of all g2 and g4 parameters is computed in a single pass
+    through dscribe, and the columns of each component are then sliced out of
+    the result, and arranged as configured (stratify may differ).
+    The context of the first component is used.
+
+    Args:
+        data: Dataset
+        components: List of SymmetryFunctions with identical
+            elems, cutoff, sparse and centers
+
+    Returns:
+        List of representations, one for each component
+
+    """
+    first = components[0]
+    for component in components:
+        for key in ["elems", "cutoff", "sparse", "centers"]:
+            if component.config[key] != first.config[key]:
+                raise ValueError(
+                    f"Batched SymmetryFunctions must have the same {key}, "
+                    f"but found {component.config[key]} and {first.config[key]}."
+                )
+
+    params = [make_params(c.runner_config["universal"]) for c in components]
+    g2_union, g2_indices = _union_params([g2 for g2, _ in params])
+    g4_union, g4_indices = _union_params([g4 for _, g4 in params])
+
+    sfs = [{"rad": {"eta": eta, "mu": mu}} for eta, mu in g2_union]
+    sfs += [
+        {"ang": {"eta": eta, "zeta": zeta, "lambd": lambd}}
+        for eta, zeta, lambd in g4_union
+    ]
+
+    union = SymmetryFunctions(
+        first.config["elems"],
+        first.config["cutoff"],
+        sfs=sfs,
+        stratify=False,
+        sparse=first.config["sparse"],
+        centers=first.config["centers"],
+        context=first.context,
+    )
+    rep = union._create(data)
+
+    result = []
+    for component, g2_idx, g4_idx in zip(components, g2_indices, g4_indices):
+        columns = acsf_columns(
+            len(first.config["elems"]), len(g2_union), len(g4_union), g2_idx, g4_idx
+        )
+        rep_component = component._transform(rep[:, columns])
+        result.append(component._arrange(data, rep_component))
+
+    return result
+
+
+def acsf_columns(n_elems, n_g2, n_g4, g2_idx, g4_idx):
+    """Columns of the dscribe ACSF output that belong to a subset of the parameters.
+
+    dscribe lays out the output as one block of G1 and G2 per element,
+    followed by one block of G4 per pair of elements.
+
+    Args:
+        n_elems: Number of elements
+        n_g2, n_g4: Number of g2 and g4 parameters of the full output
+        g2_idx, g4_idx: Indices of the g2 and g4 parameters in the subset
+
+    Returns:
+        Column indices, in the order of the output for the subset only
+
+    """
+    radial = np.concatenate([[0], 1 + np.asarray(g2_idx, dtype=int)])
+    columns = [e * (1 + n_g2) + radial for e in range(n_elems)]
+
+    start = n_elems * (1 + n_g2)
+    n_pairs = n_elems * (n_elems + 1) // 2
+    columns += [
+        start + p * n_g4 + np.asarray(g4_idx, dtype=int) for p in range(n_pairs)
+    ]
 
+    return np.concatenate(columns)
+
+
+def _union_params(params):
+    """Union of parameter arrays (or None), and the indices of each in it."""
+    union = {}
+    indices = []
+
+    for p in params:
+        if p is None:
+            p = []
+
+        idx = []
+        for row in p:
+            idx.append(union.setdefault(tuple(row), len(union)))
+
+        indices.append(np.array(idx, dtype=int))
+
+    return list(union.keys()), indices
+
+
+def compute_symmfs(
+    data, elems, cutoff, sfs, stratify=True, sparse=False, n_jobs=1, verbose=False
+):
+    rep = create_symmfs(
+        data, elems, cutoff, sfs, sparse=sparse, n_jobs=n_jobs, verbose=verbose
+    )
+
+    return stratified(data, rep, elems=elems, stratify=stratify, sparse=sparse)
+
+
+def create_symmfs(data, elems, cutoff, sfs, sparse=False, n_jobs=1, verbose=False):
+    """Compute SFs with dscribe, returning the flat n_total_atoms x dim output."""
     periodic = data.b is not None
+    acsf = descriptors.get(
+        "ds_acsf",
+        {"elems": elems, "cutoff": cutoff, "sfs": sfs, "sparse": sparse},
+        periodic,
+        lambda: make_acsf(elems, cutoff, sfs, sparse=sparse, periodic=periodic),
+    )
+
+    return acsf.create(systems.from_data(data), n_jobs=n_jobs, verbose=verbose)
+
+
+def make_acsf(elems, cutoff, sfs, sparse=False, periodic=False):
+    """Set up the dscribe ACSF descriptor."""
+    g2_params, g4_params = make_params(sfs)
 
-    acsf = ACSF(
+    return ACSF(
         rcut=cutoff,
         g2_params=g2_params,
         g4_params=g4_params,
         species=elems,
-        sparse=False,
+        sparse=sparse,
         periodic=periodic,
     )
 
-    rep = acsf.create(data.as_Atoms(), n_jobs=n_jobs, verbose=verbose)
-
-    if stratify:
-        return in_blocks(data, to_local(data, rep), elems=elems)
-    else:
-        return to_local(data, rep)
-
 
 def make_params(sfs):
     g2_params = []
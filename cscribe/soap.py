@@ -1,6 +1,8 @@
-from cmlkit.representation import Representation
+import numpy as np
+
 from dscribe.descriptors import SOAP as dsSOAP
 
+from .representation import Representation
 from .conversion import to_local
 
 
@@ -22,13 +24,35 @@ class SOAP(Representation):
         rbf: Radial basis set. Either "gto" for Gaussians,
             or "polynomial" for a polynomial basis set more
             similar to the "original" SOAP approach.
+        columns: Indices of the columns of the dscribe output to keep, or None
+            (default) to keep all, see Representation.pruned.
+        projection: Config of a projection of the dscribe output onto fewer
+            dimensions, or None (default), see Representation.projected.
+        centers: Atoms to compute the representation for, or None (default) for
+            all. Either a list of elements, or the name of a property of the
+            dataset with the indices (or a boolean mask) of the selected atoms
+            in each system, see conversion.center_indices. Only rows for the
+            selected atoms are computed and returned.
 
     """
 
     kind = "ds_soap"
+    local = True
     default_context = {"n_jobs": 1, "verbose": False}
 
-    def __init__(self, elems, cutoff, sigma, n_max, l_max, rbf="gto", context={}):
+    def __init__(
+        self,
+        elems,
+        cutoff,
+        sigma,
+        n_max,
+        l_max,
+        rbf="gto",
+        columns=None,
+        centers=None,
+        projection=None,
+        context={},
+    ):
         super().__init__(context=context)
 
         self.config = {
@@ -38,40 +62,100 @@ class SOAP(Representation):
             "n_max": n_max,
             "l_max": l_max,
             "rbf": rbf,
+            "columns": columns,
+            "centers": centers,
+            "projection": projection,
         }
 
     def _get_config(self):
         return self.config
 
-    def compute(self, data):
-        if data.b is None:
-            ds_soap = dsSOAP(
-                species=self.config["elems"],
-                rcut=self.config["cutoff"],
-                nmax=self.config["n_max"],
-                lmax=self.config["l_max"],
-                sigma=self.config["sigma"],
-                rbf=self.config["rbf"],
-                crossover=True,
-                periodic=False,
-            )
+    def _descriptor(self, periodic):
+        return dsSOAP(
+            species=self.config["elems"],
+            rcut=self.config["cutoff"],
+            nmax=self.config["n_max"],
+            lmax=self.config["l_max"],
+            sigma=self.config["sigma"],
+            rbf=self.config["rbf"],
+            crossover=True,
+            periodic=periodic,
+        )
+
+    def _environment_cutoff(self):
+        # dscribe pads the cutoff so the gaussians decay to 0.001 at the cutoff
+        padding = self.config["sigma"] * np.sqrt(-2 * np.log(0.001))
+
+        return self.config["cutoff"] + padding
+
+    def _arrange(self, data, rep):
+        return self._stage("to_local", to_local, data, rep, centers=self._centers(data))
+
+
+class AverageSOAP(SOAP):
+    """Global SOAP, averaged over the atoms of each system (implemented in DScribe).
 
-        else:
-            ds_soap = dsSOAP(
-                species=self.config["elems"],
-                rcut=self.config["cutoff"],
-                nmax=self.config["n_max"],
-                lmax=self.config["l_max"],
-                sigma=self.config["sigma"],
-                rbf=self.config["rbf"],
-                crossover=True,
-                periodic=True,
+    dscribe computes the SOAP vectors of one system at a time and averages
+    them right away, so the per-atom output never exists for the whole
+    dataset, and the result is one row per system (n_systems x dim).
+
+    Parameters are the same as for SOAP, with the addition of:
+        average: How to average. Only "outer" is supported, i.e. the mean of
+            the power spectra of all atoms. (dscribe 0.3 does not expose the
+            expansion coefficients, so "inner" averaging, where the power
+            spectrum is computed from averaged coefficients, is not available.)
+
+    """
+
+    kind = "ds_soap_average"
+    local = False
+
+    def __init__(
+        self,
+        elems,
+        cutoff,
+        sigma,
+        n_max,
+        l_max,
+        rbf="gto",
+        average="outer",
+        columns=None,
+        projection=None,
+        context={},
+    ):
+        super().__init__(
+            elems,
+            cutoff,
+            sigma,
+            n_max,
+            l_max,
+            rbf=rbf,
+            columns=columns,
+            projection=projection,
+            context=context,
+        )
+
+        if average != "outer":
+            raise ValueError(
+                f"Unknown average {average}. (Allowed: outer, since dscribe does "
+                "not provide the coefficients needed for inner averaging.)"
             )
 
-        rep = ds_soap.create(
-            data.as_Atoms(),
-            n_jobs=self.context["n_jobs"],
-            verbose=self.context["verbose"],
+        del self.config["centers"]
+        self.config["average"] = average
+
+    def _descriptor(self, periodic):
+        return dsSOAP(
+            species=self.config["elems"],
+            rcut=self.config["cutoff"],
+            nmax=self.config["n_max"],
+            lmax=self.config["l_max"],
+            sigma=self.config["sigma"],
+            rbf=self.config["rbf"],
+            crossover=True,
+            average=True,
+            periodic=periodic,
         )
 
-        return to_local(data, rep)
+    def _arrange(self, data, rep):
+        return rep
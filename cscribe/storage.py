@@ -0,0 +1,159 @@
+"""Store computed representations on disk.
+
+Representations are written as a directory of plain .npy files, plus a small
+meta.json describing how to put them back together. This way, they can
+be loaded memory-mapped, without reading everything into memory.
+
+Supported are ndarrays, scipy.sparse matrices, Ragged and ByElement.
+
+"""
+
+import json
+import numpy as np
+import scipy.sparse as sp
+from pathlib import Path
+
+from .containers import Ragged, ByElement
+
+
+def save(directory, rep):
+    """Save representation to directory (which will be created).
+
+    Args:
+        directory: Path to save to
+        rep: Representation (ndarray, sparse matrix, Ragged or ByElement)
+
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(rep, Ragged):
+        meta = {"type": "ragged", "z": rep.z is not None}
+        save(directory / "data", rep.data)
+        np.save(directory / "offsets.npy", rep.offsets)
+        if rep.z is not None:
+            np.save(directory / "z.npy", rep.z)
+
+    elif isinstance(rep, ByElement):
+        meta = {
+            "type": "by_element",
+            "elems": [int(e) for e in rep.elems],
+            "n": int(rep.n),
+        }
+        for e in rep.elems:
+            save(directory / str(e), rep.blocks[e])
+            np.save(directory / f"{e}_system.npy", rep.system[e])
+            np.save(directory / f"{e}_atom.npy", rep.atom[e])
+
+    elif sp.issparse(rep):
+        rep = rep.tocsr()
+        meta = {"type": "csr", "shape": list(rep.shape)}
+        np.save(directory / "data.npy", rep.data)
+        np.save(directory / "indices.npy", rep.indices)
+        np.save(directory / "indptr.npy", rep.indptr)
+
+    elif isinstance(rep, np.ndarray) and rep.dtype != object:
+        meta = {"type": "array"}
+        target = directory / "array.npy"
+
+        if _is_backed_by(rep, target):
+            # was allocated in place, see allocate
+            rep.flush()
+        else:
+            np.save(target, rep)
+
+    else:
+        raise ValueError(f"Cannot save representation of type {type(rep)}.")
+
+    with open(directory / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+
+def load(directory, mmap_mode=None):
+    """Load representation from directory.
+
+    Args:
+        directory: Path to load from
+        mmap_mode: Passed to np.load, "r" loads arrays memory-mapped
+
+    Returns:
+        Representation (ndarray, sparse matrix, Ragged or ByElement)
+
+    """
+    directory = Path(directory)
+
+    with open(directory / "meta.json", "r") as f:
+        meta = json.load(f)
+
+    def array(name):
+        return np.load(directory / name, mmap_mode=mmap_mode)
+
+    kind = meta["type"]
+
+    if kind == "ragged":
+        z = array("z.npy") if meta["z"] else None
+        return Ragged(
+            load(directory / "data", mmap_mode=mmap_mode), array("offsets.npy"), z=z
+        )
+
+    elif kind == "by_element":
+        elems = meta["elems"]
+        return ByElement(
+            elems,
+            {e: load(directory / str(e), mmap_mode=mmap_mode) for e in elems},
+            {e: array(f"{e}_system.npy") for e in elems},
+            {e: array(f"{e}_atom.npy") for e in elems},
+            n=meta["n"],
+        )
+
+    elif kind == "csr":
+        return sp.csr_matrix(
+            (array("data.npy"), array("indices.npy"), array("indptr.npy")),
+            shape=tuple(meta["shape"]),
+        )
+
+    elif kind == "array":
+        return array("array.npy")
+
+    else:
+        raise ValueError(f"Unknown stored representation type {kind}.")
+
+
+def allocate(directory, shape, dtype):
+    """Preallocate an array as memory-mapped .npy file in directory.
+
+    The array can be filled in place and then passed to save, which
+    will only write the remaining metadata.
+
+    An existing array is never overwritten, as it may still be memory-mapped
+    elsewhere, where truncating the file would corrupt it (or crash with SIGBUS).
+
+    Args:
+        directory: Path to save to (will be created)
+        shape: Shape of array
+        dtype: dtype of array
+
+    Returns:
+        np.memmap
+
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    target = directory / "array.npy"
+    if target.exists():
+        raise FileExistsError(f"Will not overwrite existing array {target}.")
+
+    return np.lib.format.open_memmap(target, mode="w+", dtype=dtype, shape=shape)
+
+
+def _is_backed_by(array, path):
+    if not isinstance(array, np.memmap) or array.filename is None:
+        return False
+
+    return Path(array.filename).resolve() == Path(path).resolve()
+
+
+def size(directory):
+    """Total size of all files in directory, in bytes."""
+    return sum(f.stat().st_size for f in Path(directory).rglob("*") if f.is_file())
@@ -0,0 +1,32 @@
+"""Build dscribe systems directly from the arrays of a dataset.
+
+dscribe works on its own System class, a subclass of ase.Atoms, and converts
+every ase.Atoms it is given with System.from_atoms, which goes through
+chemical symbols, masses, momenta and so on. Starting from data.as_Atoms(),
+each structure is therefore set up twice, and for small molecules this can
+take longer than computing the descriptor. Instead, we construct System
+objects straight from the packed z, r and b arrays of the dataset, which
+dscribe uses as they are.
+
+The ase.Atoms route is kept as fallback, see the input context setting
+of Representation.
+
+"""
+
+from dscribe.core import System
+
+
+def from_data(data):
+    """List of dscribe Systems for each system in data."""
+    if data.b is None:
+        return [make(data.z[i], data.r[i]) for i in range(data.n)]
+    else:
+        return [make(data.z[i], data.r[i], data.b[i]) for i in range(data.n)]
+
+
+def make(z, r, b=None):
+    """dscribe System with atomic numbers z, positions r and cell b (or None)."""
+    if b is None:
+        return System(numbers=z, positions=r)
+    else:
+        return System(numbers=z, positions=r, cell=b, pbc=True)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+import shutil
+import tempfile
+import numpy as np
+
+from cscribe import benchmark
+
+
+class TestBenchmark(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_datasets(self):
+        for kind, make in benchmark.datasets.items():
+            data = make(5)
+            self.assertEqual(data.n, 5)
+
+            for r in data.r:
+                distances = np.linalg.norm(r[:, None, :] - r[None, :, :], axis=2)
+                distances[np.diag_indices_from(distances)] = np.inf
+                self.assertGreater(distances.min(), 0.8)
+
+            # deterministic
+            np.testing.assert_array_equal(make(5).r[3], data.r[3])
+
+    def test_run(self):
+        results = benchmark.run(
+            sizes=[3], n_jobs=[1], names=["soap", "mbtr"], isolate=False
+        )
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertGreater(result["atoms_per_second"], 0)
+
+        path = f"{self.tmpdir}/baseline.json"
+        benchmark.save(results, path)
+        baseline = benchmark.load(path)
+
+        self.assertEqual(benchmark.compare(results, baseline), [])
+
+        slower = [{**r, "atoms_per_second": r["atoms_per_second"] / 2} for r in results]
+        regressions = benchmark.compare(slower, baseline)
+        self.assertEqual(len(regressions), 4)
+        self.assertEqual(regressions[0][2], "throughput")
+
+    def test_input_speedup(self):
+        result = benchmark.input_speedup(n=3, isolate=False)
+
+        for setting in ["ase", "arrays"]:
+            self.assertGreater(result[setting]["compute"], 0)
+        self.assertGreater(result["speedup"], 0)
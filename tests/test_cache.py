@@ -0,0 +1,178 @@
+from unittest import TestCase
+import unittest.mock
+import shutil
+import tempfile
+import numpy as np
+
+from cmlkit import Dataset
+
+from cscribe.cache import DescriptorCache
+from cscribe.containers import Ragged
+from cscribe.sf import SymmetryFunctions
+from cscribe.mbtr import MBTR
+from cscribe import storage
+
+
+class TestDescriptorCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.data = Dataset(
+            z=np.array([[1, 2, 1], [2, 2, 1]]),
+            r=np.array(
+                [
+                    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                    [[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0]],
+                ]
+            ),
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hit(self):
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+        context = {"cache": self.tmpdir}
+
+        sf = SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, context=context)
+        first = sf.compute(self.data)
+
+        sf = SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, context=context)
+        with unittest.mock.patch.object(sf, "_compute") as compute:
+            second = sf.compute(self.data)
+            compute.assert_not_called()
+
+        self.assertIsInstance(second, Ragged)
+        self.assertIsInstance(second.data, np.memmap)
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+
+        # different config -> miss
+        sf = SymmetryFunctions([1, 2], sfs=sfs, cutoff=4.0, context=context)
+        with unittest.mock.patch.object(
+            sf, "_compute", return_value=np.zeros(3)
+        ) as compute:
+            sf.compute(self.data)
+            compute.assert_called_once()
+
+    def test_eviction(self):
+        cache = DescriptorCache(self.tmpdir, max_bytes=4000)
+
+        cache.put("a", np.zeros(200))
+        cache.put("b", np.zeros(200))
+        self.assertIsNotNone(cache.get("a"))  # "a" is now more recently used
+
+        cache.put("c", np.zeros(200))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.size(), 4000)
+
+    def test_too_large(self):
+        cache = DescriptorCache(self.tmpdir, max_bytes=4000)
+
+        cache.put("a", np.zeros(200))
+        cache.put("large", np.zeros(1000))
+
+        # not stored, and nothing else evicted for it
+        self.assertIsNone(cache.get("large"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_flatten(self):
+        mbtr_2 = {
+            "start": 0,
+            "stop": 1,
+            "num": 5,
+            "geomf": "1/distance",
+            "weightf": "unity",
+            "broadening": 0.01,
+            "acc": 0.001,
+        }
+
+        flat = MBTR(elems=[1, 2], mbtr_2=mbtr_2)
+        nested = MBTR(elems=[1, 2], mbtr_2=mbtr_2, flatten=False)
+
+        # flatten is not part of the config, but changes the output
+        self.assertEqual(flat._get_config(), nested._get_config())
+        self.assertNotEqual(flat._cache_config(), nested._cache_config())
+
+
+class TestSystemCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.r = [
+            [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+            [[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0]],
+            [[0.0, 0.0, 0.0], [1.1, 0.0, 0.0], [0.0, 1.3, 0.0]],
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_incremental(self):
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+        context = {"system_cache": self.tmpdir}
+
+        first = Dataset(z=np.array([[1, 2, 1], [2, 2, 1]]), r=np.array(self.r[:2]))
+
+        # grown dataset with one new system and one duplicate
+        second = Dataset(
+            z=np.array([[1, 2, 1], [2, 2, 1], [1, 1, 2], [1, 1, 2]]),
+            r=np.array(self.r + [self.r[2]]),
+        )
+
+        sf = SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, context=context)
+        sf(first)
+
+        create = sf._create
+        with unittest.mock.patch.object(sf, "_create", side_effect=create) as mock:
+            computed = sf(second)
+
+            mock.assert_called_once()
+            self.assertEqual(mock.call_args[0][0].n, 1)
+
+        expected = SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0)(second)
+
+        for a, b in zip(computed, expected):
+            np.testing.assert_array_equal(a, b)
+
+    def test_global(self):
+        mbtr_2 = {
+            "start": 0,
+            "stop": 1,
+            "num": 3,
+            "geomf": "1/distance",
+            "weightf": "unity",
+            "broadening": 0.01,
+            "acc": 0.001,
+        }
+        data = Dataset(
+            z=np.array([[1, 2, 1], [2, 2, 1], [1, 2, 1]]),
+            r=np.array([self.r[0], self.r[1], self.r[0]]),
+        )
+
+        computed = MBTR(
+            elems=[1, 2], mbtr_2=mbtr_2, context={"system_cache": self.tmpdir}
+        ).compute(data)
+        expected = MBTR(elems=[1, 2], mbtr_2=mbtr_2).compute(data)
+
+        np.testing.assert_array_equal(computed, expected)
+
+
+class TestStorage(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        rep = Ragged.from_counts(np.random.random((5, 3)), [2, 3], z=np.arange(5))
+        storage.save(self.tmpdir + "/ragged", rep)
+        loaded = storage.load(self.tmpdir + "/ragged", mmap_mode="r")
+
+        np.testing.assert_array_equal(loaded.data, rep.data)
+        np.testing.assert_array_equal(loaded.offsets, rep.offsets)
+        np.testing.assert_array_equal(loaded.z, rep.z)
@@ -0,0 +1,66 @@
+from unittest import TestCase
+import pickle
+import numpy as np
+
+from cscribe.containers import Ragged
+
+
+class TestRagged(TestCase):
+    def setUp(self):
+        self.data = np.arange(20.0).reshape(10, 2)
+        self.rep = Ragged.from_counts(self.data, [3, 0, 5, 2], z=np.arange(10))
+
+    def test_indexing(self):
+        self.assertEqual(len(self.rep), 4)
+        self.assertEqual(self.rep.dtype, object)
+
+        np.testing.assert_array_equal(self.rep[0], self.data[0:3])
+        np.testing.assert_array_equal(self.rep[-1], self.data[8:10])
+        self.assertEqual(self.rep[1].shape, (0, 2))
+
+        # integer indexing returns views
+        self.assertTrue(np.shares_memory(self.rep[2], self.data))
+
+        with self.assertRaises(IndexError):
+            self.rep[4]
+
+    def test_slicing(self):
+        sliced = self.rep[1:3]
+
+        self.assertEqual(len(sliced), 2)
+        np.testing.assert_array_equal(sliced[1], self.data[3:8])
+        np.testing.assert_array_equal(sliced.z, np.arange(3, 8))
+        self.assertTrue(np.shares_memory(sliced.data, self.data))
+
+        picked = self.rep[[3, 0]]
+
+        np.testing.assert_array_equal(picked.counts, [2, 3])
+        np.testing.assert_array_equal(picked[0], self.data[8:10])
+        np.testing.assert_array_equal(picked[1], self.data[0:3])
+
+    def test_compatibility(self):
+        as_array = np.asarray(self.rep)
+
+        self.assertEqual(as_array.shape, (4,))
+        for a, b in zip(as_array, self.rep):
+            np.testing.assert_array_equal(a, b)
+
+        np.testing.assert_array_equal(
+            np.concatenate(self.rep[2:4], axis=0), self.data[3:10]
+        )
+
+        # numpy 2 asks for copy=False if a copy must be avoided
+        self.assertEqual(self.rep.__array__(copy=True).shape, (4,))
+        with self.assertRaises(ValueError):
+            self.rep.__array__(copy=False)
+
+        # rows of different lengths can't be cast to a numeric array
+        self.assertEqual(np.asarray(self.rep, dtype=object).shape, (4,))
+        with self.assertRaises(ValueError):
+            self.rep.__array__(dtype=np.float32)
+
+    def test_pickle(self):
+        restored = pickle.loads(pickle.dumps(self.rep))
+
+        np.testing.assert_array_equal(restored.data, self.data)
+        np.testing.assert_array_equal(restored.offsets, self.rep.offsets)
@@ -0,0 +1,197 @@
+from unittest import TestCase
+import numpy as np
+import scipy.sparse as sp
+
+from cmlkit import Dataset
+
+from cscribe.containers import Ragged
+from cscribe.conversion import (
+    to_local,
+    in_blocks,
+    by_element,
+    stratified,
+    element_indices,
+    center_indices,
+    centers_from_mask,
+)
+
+
+class TestToLocal(TestCase):
+    def setUp(self):
+        self.data = Dataset(
+            z=np.array([np.array([1, 8, 1]), np.array([6, 1])], dtype=object),
+            r=np.array(
+                [np.random.random((3, 3)), np.random.random((2, 3))], dtype=object
+            ),
+        )
+        self.rep = np.random.random((5, 4))
+
+    def test_to_local(self):
+        computed = to_local(self.data, self.rep)
+
+        self.assertIsInstance(computed, Ragged)
+        np.testing.assert_array_equal(computed[0], self.rep[0:3])
+        np.testing.assert_array_equal(computed[1], self.rep[3:5])
+        np.testing.assert_array_equal(computed.z, [1, 8, 1, 6, 1])
+
+        # no copies are made
+        self.assertIs(computed.data, self.rep)
+
+
+class TestInBlocks(TestCase):
+    def setUp(self):
+        self.data = Dataset(
+            z=np.array([np.array([1, 8, 1]), np.array([6, 1])], dtype=object),
+            r=np.array(
+                [np.random.random((3, 3)), np.random.random((2, 3))], dtype=object
+            ),
+        )
+        self.rep = np.random.random((5, 4))
+
+    def test_in_blocks(self):
+        computed = in_blocks(self.data, to_local(self.data, self.rep), elems=[1, 6, 8])
+
+        self.assertEqual(len(computed), 2)
+        self.assertEqual(computed[0].shape, (3, 12))
+        self.assertEqual(computed[1].shape, (2, 12))
+
+        # first atom of first system is H -> first block
+        np.testing.assert_array_equal(computed[0][0][0:4], self.rep[0])
+        np.testing.assert_array_equal(computed[0][0][4:], 0.0)
+
+        # second atom of first system is O -> third block
+        np.testing.assert_array_equal(computed[0][1][8:12], self.rep[1])
+        np.testing.assert_array_equal(computed[0][1][0:8], 0.0)
+
+        # first atom of second system is C -> second block
+        np.testing.assert_array_equal(computed[1][0][4:8], self.rep[3])
+        np.testing.assert_array_equal(computed[1][0][0:4], 0.0)
+        np.testing.assert_array_equal(computed[1][0][8:12], 0.0)
+
+    def test_in_blocks_dtype(self):
+        rep = self.rep.astype(np.float32)
+        computed = in_blocks(
+            self.data, to_local(self.data, rep), elems=[1, 6, 8], dtype=np.float32
+        )
+
+        self.assertEqual(computed.data.dtype, np.float32)
+        np.testing.assert_array_equal(computed[0][0][0:4], rep[0])
+
+    def test_in_blocks_default_elems(self):
+        computed = in_blocks(self.data, to_local(self.data, self.rep))
+        explicit = in_blocks(self.data, to_local(self.data, self.rep), elems=[1, 6, 8])
+
+        for a, b in zip(computed, explicit):
+            np.testing.assert_array_equal(a, b)
+
+    def test_element_indices(self):
+        np.testing.assert_array_equal(
+            element_indices([8, 1, 6, 1], [1, 6, 8]), [2, 0, 1, 0]
+        )
+
+        with self.assertRaises(ValueError):
+            element_indices([1, 2], [1])
+
+    def test_in_blocks_sparse(self):
+        dense = in_blocks(self.data, to_local(self.data, self.rep), elems=[1, 6, 8])
+        sparse = in_blocks(
+            self.data, to_local(self.data, self.rep), elems=[1, 6, 8], sparse=True
+        )
+
+        self.assertEqual(sparse.data.nnz, self.rep.size)
+        np.testing.assert_array_equal(sparse.data.toarray(), dense.data)
+
+        # sparse input
+        from_sparse = in_blocks(
+            self.data,
+            to_local(self.data, sp.csr_matrix(self.rep)),
+            elems=[1, 6, 8],
+            sparse=True,
+        )
+        np.testing.assert_array_equal(from_sparse.data.toarray(), dense.data)
+
+
+class TestByElement(TestCase):
+    def setUp(self):
+        self.data = Dataset(
+            z=np.array([np.array([1, 8, 1]), np.array([6, 1])], dtype=object),
+            r=np.array(
+                [np.random.random((3, 3)), np.random.random((2, 3))], dtype=object
+            ),
+        )
+        self.rep = np.random.random((5, 4))
+
+    def test_by_element(self):
+        computed = by_element(self.data, to_local(self.data, self.rep), elems=[1, 6, 8])
+
+        self.assertEqual(computed[1].shape, (3, 4))
+        self.assertEqual(computed[6].shape, (1, 4))
+        self.assertEqual(computed[8].shape, (1, 4))
+
+        np.testing.assert_array_equal(computed[1], self.rep[[0, 2, 4]])
+        np.testing.assert_array_equal(computed.system[1], [0, 0, 1])
+        np.testing.assert_array_equal(computed.atom[1], [0, 2, 1])
+
+        np.testing.assert_array_equal(computed[6], self.rep[[3]])
+        np.testing.assert_array_equal(computed.system[6], [1])
+        np.testing.assert_array_equal(computed.atom[6], [0])
+
+    def test_unused_element(self):
+        computed = by_element(
+            self.data, to_local(self.data, self.rep), elems=[1, 6, 8, 9]
+        )
+
+        self.assertEqual(computed[9].shape, (0, 4))
+
+    def test_centers(self):
+        centers = [np.array([1]), np.array([0, 1])]
+        rep = self.rep[[1, 3, 4]]
+
+        computed = in_blocks(
+            self.data, to_local(self.data, rep, centers=centers), elems=[1, 6, 8]
+        )
+        self.assertEqual(computed[0].shape, (1, 12))
+        self.assertEqual(computed[1].shape, (2, 12))
+        np.testing.assert_array_equal(computed[0][0][8:12], rep[0])
+        np.testing.assert_array_equal(computed[1][0][4:8], rep[1])
+
+        computed = stratified(
+            self.data, rep, elems=[1, 6, 8], stratify="elements", centers=centers
+        )
+        np.testing.assert_array_equal(computed[1], rep[[2]])
+        np.testing.assert_array_equal(computed.system[1], [1])
+        np.testing.assert_array_equal(computed.atom[1], [1])
+        np.testing.assert_array_equal(computed.atom[8], [1])
+
+    def test_center_indices(self):
+        self.assertIsNone(center_indices(self.data, None))
+
+        computed = center_indices(self.data, [1])
+        np.testing.assert_array_equal(computed[0], [0, 2])
+        np.testing.assert_array_equal(computed[1], [1])
+
+        mask = [True, False, False, False, True]
+        self.data.p["mask"] = centers_from_mask(self.data, mask)
+        self.data.p["idx"] = np.array([[2], [0, 1]], dtype=object)
+
+        computed = center_indices(self.data, "mask")
+        np.testing.assert_array_equal(computed[0], [0])
+        np.testing.assert_array_equal(computed[1], [1])
+
+        computed = center_indices(self.data, "idx")
+        np.testing.assert_array_equal(computed[0], [2])
+        np.testing.assert_array_equal(computed[1], [0, 1])
+
+        self.data.p["bad"] = np.array([[3], [0]], dtype=object)
+        with self.assertRaises(ValueError):
+            center_indices(self.data, "bad")
+
+        with self.assertRaises(ValueError):
+            center_indices(self.data, "missing")
+
+    def test_stratified(self):
+        with self.assertRaises(ValueError):
+            stratified(self.data, self.rep, stratify="blocks")
+
+        computed = stratified(self.data, self.rep, elems=[1, 6, 8], stratify="elements")
+        self.assertEqual(computed[8].shape, (1, 4))
@@ -0,0 +1,37 @@
+from unittest import TestCase
+import numpy as np
+
+from cscribe import descriptors
+from cscribe.soap import SOAP
+from cscribe.sf import SymmetryFunctions
+
+
+class TestDescriptors(TestCase):
+    def setUp(self):
+        descriptors.clear()
+
+    def tearDown(self):
+        descriptors.clear()
+
+    def test_memoized(self):
+        soap = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, rbf="polynomial")
+        again = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, rbf="polynomial")
+
+        descriptor = soap._get_descriptor(periodic=False)
+
+        self.assertIs(again._get_descriptor(periodic=False), descriptor)
+        self.assertIsNot(soap._get_descriptor(periodic=True), descriptor)
+
+        other = SOAP([1, 2], cutoff=4.0, sigma=0.5, n_max=2, l_max=2, rbf="polynomial")
+        self.assertIsNot(other._get_descriptor(periodic=False), descriptor)
+
+        self.assertEqual(descriptors.stats["hits"], 1)
+        self.assertEqual(descriptors.stats["misses"], 3)
+        self.assertGreater(descriptors.stats["setup_seconds"], 0.0)
+
+    def test_eviction(self):
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+        for cutoff in np.linspace(1.0, 5.0, descriptors.max_entries + 1):
+            SymmetryFunctions([1, 2], sfs=sfs, cutoff=cutoff)._get_descriptor(False)
+
+        self.assertEqual(len(descriptors._memo), descriptors.max_entries)
@@ -0,0 +1,111 @@
+from unittest import TestCase
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+
+from cmlkit.dataset import Subset
+
+from cscribe.sf import SymmetryFunctions
+from cscribe.mbtr import MBTR
+from cscribe.soap import SOAP
+from cscribe.kernels import kernel_matrix
+
+from .test_representation import make_data, mbtr_2
+
+
+def atom_kernel(kernel, x, y):
+    if sp.issparse(x):
+        x, y = x.toarray(), y.toarray()
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if kernel == "linear":
+        return x @ y.T
+    elif kernel == "polynomial":
+        return (x @ y.T + 1.0) ** 2
+    else:
+        sqdist = ((x[:, None, :] - y[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-sqdist / 2.0)
+
+
+def reference(kernel, a, b):
+    if isinstance(a, np.ndarray):
+        return atom_kernel(kernel, a, b)
+    elif hasattr(a, "blocks"):
+        result = np.zeros((a.n, b.n))
+        for e in a.elems:
+            k = atom_kernel(kernel, a[e], b[e])
+            for i, s in enumerate(a.system[e]):
+                for j, t in enumerate(b.system[e]):
+                    result[s, t] += k[i, j]
+        return result
+    else:
+        return np.array([[atom_kernel(kernel, x, y).sum() for y in b] for x in a])
+
+
+class TestKernels(TestCase):
+    def setUp(self):
+        self.data = make_data()
+        self.other = Subset.from_dataset(self.data, idx=[4, 0, 2])
+
+    def components(self):
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+
+        yield MBTR(elems=[1, 2], mbtr_2=mbtr_2)
+        yield SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+        yield SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, stratify="elements")
+        yield SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, sparse=True)
+
+    def test_kernel_matrix(self):
+        for component in self.components():
+            full = component.compute(self.data)
+            full_other = component.compute(self.other)
+
+            for kernel in ["linear", "polynomial", "gaussian"]:
+                expected = reference(kernel, full, full)
+                expected_other = reference(kernel, full, full_other)
+
+                # small blocks, and room for only one column block
+                for chunk_bytes, max_bytes in [(2**30, 2**30), (100, 1)]:
+                    computed = kernel_matrix(
+                        component,
+                        self.data,
+                        kernel=kernel,
+                        chunk_bytes=chunk_bytes,
+                        max_bytes=max_bytes,
+                        n_jobs=2,
+                    )
+                    np.testing.assert_allclose(computed, expected, rtol=1e-6)
+
+                    computed = kernel_matrix(
+                        component,
+                        self.data,
+                        self.other,
+                        kernel=kernel,
+                        chunk_bytes=chunk_bytes,
+                        max_bytes=max_bytes,
+                    )
+                    np.testing.assert_allclose(computed, expected_other, rtol=1e-6)
+
+    def test_output(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for component in self.components():
+                full = component.compute(self.data)
+                expected = reference("gaussian", full, full)
+
+                component.context["output"] = tmpdir
+
+                # only one column block fits, so evicted blocks are recomputed
+                computed = kernel_matrix(
+                    component, self.data, chunk_bytes=100, max_bytes=1
+                )
+                np.testing.assert_allclose(computed, expected, rtol=1e-6)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_unknown_kernel(self):
+        with self.assertRaises(ValueError):
+            kernel_matrix(MBTR(elems=[1, 2], mbtr_2=mbtr_2), self.data, kernel="x")
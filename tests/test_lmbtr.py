@@ -34,7 +34,7 @@ class TestLMBTR2(TestCase):
             stratify=False,
         )
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
         print(computed)
 
         # => [[[0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 4.0 0.0 4.0]
@@ -68,7 +68,7 @@ class TestLMBTR2(TestCase):
             stratify=True,
         )
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
         print(computed)
 
         # =>    [[[0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 4.0 0.0 4.0 0.0 0.0
@@ -82,3 +82,21 @@ class TestLMBTR2(TestCase):
         self.assertEqual(computed[0][0][14], 4)
         self.assertEqual(computed[0][0][12], 4)
         self.assertEqual(computed[0][1][15+9], 4)
+
+    def test_lmbtr_2_strat_sparse(self):
+        mbtr_2 = {
+            "start": 0,
+            "stop": 1,
+            "num": 5,
+            "geomf": "1/distance",
+            "weightf": "unity",
+            "broadening": 0.01,
+            "acc": 0.001,
+        }
+
+        dense = LMBTR(elems=[1, 2], mbtr_2=mbtr_2, stratify=True).compute(self.data)
+        sparse = LMBTR(
+            elems=[1, 2], mbtr_2=mbtr_2, stratify=True, sparse=True
+        ).compute(self.data)
+
+        np.testing.assert_allclose(sparse[0].toarray(), dense[0], rtol=1e-6)
@@ -3,7 +3,7 @@ import numpy as np
 
 from cmlkit import Dataset
 
-from cscribe.mbtr import MBTR
+from cscribe.mbtr import MBTR, compute_variants
 
 
 class TestMBTR1(TestCase):
@@ -23,7 +23,7 @@ class TestMBTR1(TestCase):
 
         mbtr = MBTR(elems=[0, 1, 2, 3], mbtr_1=mbtr_1, flatten=True)
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
 
         print(computed)
 
@@ -59,7 +59,7 @@ class TestMBTR2(TestCase):
 
         mbtr = MBTR(elems=[1], mbtr_2=mbtr_2, flatten=True, normalize_gaussians=True)
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
         print(computed)
 
         # => [[0. 2.0 0.]]
@@ -84,7 +84,7 @@ class TestMBTR2(TestCase):
 
         mbtr = MBTR(elems=[1], mbtr_2=mbtr_2, flatten=True, normalize_gaussians=True)
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
 
 
 class TestMBTR3(TestCase):
@@ -107,7 +107,7 @@ class TestMBTR3(TestCase):
 
         mbtr = MBTR(elems=[1], mbtr_3=mbtr_3, flatten=True, normalize_gaussians=True)
 
-        computed = mbtr(self.data)
+        computed = mbtr.compute(self.data)
         print(computed)
 
         # => [[0.         0.04444445 0.02222222 0.         0.         0.
@@ -117,3 +117,117 @@ class TestMBTR3(TestCase):
 
         self.assertGreater(computed[0][1], 0.0)
         self.assertGreater(computed[0][2], 0.0)
+
+
+class TestVariants(TestCase):
+    def setUp(self):
+        np.random.seed(123)
+        self.data = Dataset(
+            z=np.array(
+                [np.array([1, 2, 1]), np.array([2, 2]), np.array([1, 1, 2, 2])],
+                dtype=object,
+            ),
+            r=np.array(
+                [
+                    np.random.random((3, 3)) * 3,
+                    np.random.random((2, 3)) * 3,
+                    np.random.random((4, 3)) * 3,
+                ],
+                dtype=object,
+            ),
+        )
+
+    def mbtr_2(self, **kwargs):
+        return {
+            "start": 0,
+            "stop": 1.5,
+            "num": 20,
+            "geomf": "1/distance",
+            "weightf": "unity",
+            "broadening": 0.05,
+            "acc": 0.001,
+            **kwargs,
+        }
+
+    def mbtr_3(self, **kwargs):
+        return {
+            "start": -1,
+            "stop": 1,
+            "num": 15,
+            "geomf": "cos_angle",
+            "weightf": {"exp": {"ls": 0.5}},
+            "broadening": 0.1,
+            "acc": 0.001,
+            **kwargs,
+        }
+
+    def test_variants(self):
+        components = [
+            MBTR(elems=[1, 2], mbtr_2=self.mbtr_2(), mbtr_3=self.mbtr_3()),
+            MBTR(
+                elems=[1, 2],
+                mbtr_2=self.mbtr_2(num=50, broadening=0.02, stop=2.0),
+                mbtr_3=self.mbtr_3(num=8, broadening=0.2),
+                norm="l2_each",
+            ),
+            MBTR(
+                elems=[1, 2],
+                mbtr_2=self.mbtr_2(start=0.3, broadening=0.1),
+                mbtr_3=self.mbtr_3(),
+                normalize_gaussians=False,
+                norm="n_atoms",
+            ),
+        ]
+
+        for component, computed in zip(
+            components, compute_variants(self.data, components)
+        ):
+            expected = component.compute(self.data)
+
+            self.assertEqual(computed.shape, expected.shape)
+            np.testing.assert_allclose(
+                computed, expected, atol=1e-3 * np.abs(expected).max()
+            )
+
+    def test_empty_term(self):
+        # no pairs in the first system, so its k=2 term is empty
+        data = Dataset(
+            z=np.array([np.array([1]), np.array([1, 2])], dtype=object),
+            r=np.array([np.zeros((1, 3)), np.random.random((2, 3))], dtype=object),
+        )
+        components = [
+            MBTR(elems=[1, 2], mbtr_2=self.mbtr_2(), norm="l2_each"),
+            MBTR(elems=[1, 2], mbtr_2=self.mbtr_2(num=30), norm="l2_each"),
+        ]
+
+        for component, computed in zip(components, compute_variants(data, components)):
+            expected = component.compute(data)
+
+            self.assertTrue(np.isfinite(computed).all())
+            np.testing.assert_array_equal(expected[0], 0.0)
+            np.testing.assert_array_equal(computed[0], 0.0)
+            np.testing.assert_allclose(
+                computed, expected, atol=1e-3 * np.abs(expected).max()
+            )
+
+    def test_fine_grid_too_large(self):
+        with self.assertRaises(ValueError):
+            compute_variants(
+                self.data,
+                [
+                    MBTR(elems=[1, 2], mbtr_2=self.mbtr_2()),
+                    MBTR(
+                        elems=[1, 2], mbtr_2=self.mbtr_2(stop=1000.0, broadening=1e-3)
+                    ),
+                ],
+            )
+
+    def test_mismatch(self):
+        with self.assertRaises(ValueError):
+            compute_variants(
+                self.data,
+                [
+                    MBTR(elems=[1, 2], mbtr_2=self.mbtr_2()),
+                    MBTR(elems=[1, 2], mbtr_2=self.mbtr_2(geomf="distance")),
+                ],
+            )
@@ -0,0 +1,83 @@
+from unittest import TestCase
+import numpy as np
+
+from cmlkit import Dataset
+
+from cscribe import neighbours
+from cscribe.sf import SymmetryFunctions
+from cscribe.soap import SOAP
+
+
+def make_periodic():
+    np.random.seed(123)
+    cells = [np.eye(3) * 3.0, np.array([[3.0, 0, 0], [1.0, 3.5, 0], [0, 0.5, 4.0]])]
+    return Dataset(
+        z=np.array([np.array([1, 2, 1]), np.array([2, 2])], dtype=object),
+        r=np.array(
+            [np.random.random((3, 3)) * 3, np.random.random((2, 3)) * 3],
+            dtype=object,
+        ),
+        b=np.array(cells),
+    )
+
+
+class TestNeighbours(TestCase):
+    def setUp(self):
+        self.data = make_periodic()
+        neighbours.clear()
+
+    def tearDown(self):
+        neighbours.clear()
+
+    def test_same_as_periodic(self):
+        sfs = [
+            {"rad": {"eta": 0.5, "mu": 0.0}},
+            {"ang": {"eta": 0.5, "zeta": 1, "lambd": 1}},
+        ]
+
+        for make in [
+            lambda c: SymmetryFunctions([1, 2], sfs=sfs, cutoff=4.0, context=c),
+            lambda c: SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context=c),
+        ]:
+            direct = make({}).compute(self.data)
+            cached = make({"neighbour_cache": True}).compute(self.data)
+
+            for a, b in zip(direct, cached):
+                np.testing.assert_allclose(a, b, rtol=1e-5, atol=1e-5)
+
+    def test_smaller_cutoff(self):
+        z, r, b = self.data.z[1], self.data.r[1], self.data.b[1]
+
+        large = neighbours.environment("x", z, r, b, 5.0)
+        small = neighbours.environment("x", z, r, b, 2.0)
+        expected = neighbours.build_environment(z, r, b, 2.0)
+
+        self.assertEqual(neighbours._memo["x"][0], 5.0)
+        self.assertLess(len(small[0]), len(large[0]))
+        np.testing.assert_array_equal(small[0], expected[0])
+        np.testing.assert_allclose(small[1], expected[1])
+
+        # originals come first
+        np.testing.assert_array_equal(small[0][:2], z)
+
+    def test_max_bytes(self):
+        z, r, b = self.data.z[1], self.data.r[1], self.data.b[1]
+        default = neighbours.max_bytes
+
+        try:
+            neighbours.environment("x", z, r, b, 2.0)
+            size = neighbours._size
+            self.assertEqual(size, neighbours._nbytes(neighbours._memo["x"]))
+
+            # only one environment fits, the oldest is dropped
+            neighbours.max_bytes = size
+            neighbours.environment("y", z, r, b, 2.0)
+            self.assertEqual(list(neighbours._memo), ["y"])
+            self.assertEqual(neighbours._size, size)
+
+            # too large to be kept at all
+            neighbours.environment("z", z, r, b, 5.0)
+            self.assertNotIn("z", neighbours._memo)
+            self.assertLessEqual(neighbours._size, neighbours.max_bytes)
+        finally:
+            neighbours.max_bytes = default
@@ -0,0 +1,707 @@
+from unittest import TestCase
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+
+from cmlkit import Dataset
+from cmlkit.dataset import Subset
+
+from cscribe.sf import SymmetryFunctions
+from cscribe.mbtr import MBTR, LMBTR
+from cscribe.soap import SOAP, AverageSOAP
+from cscribe.containers import Ragged
+from cscribe import storage
+
+
+def assert_same(a, b):
+    if isinstance(a, np.ndarray):
+        np.testing.assert_array_equal(a, b)
+    elif hasattr(a, "blocks"):
+        for e in a.elems:
+            np.testing.assert_array_equal(a[e], b[e])
+            np.testing.assert_array_equal(a.system[e], b.system[e])
+            np.testing.assert_array_equal(a.atom[e], b.atom[e])
+    else:
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            np.testing.assert_array_equal(x, y)
+
+
+def make_data():
+    np.random.seed(123)
+    return Dataset(
+        z=np.array(
+            [np.array([1, 2, 1]), np.array([2, 2]), np.array([1, 1, 2, 2])]
+            + [np.array([1, 2, 1]) for i in range(4)]
+            + [None],
+            dtype=object,
+        )[:-1],
+        r=np.array(
+            [np.random.random((3, 3)) * 3, np.random.random((2, 3)) * 3]
+            + [np.random.random((4, 3)) * 3]
+            + [np.random.random((3, 3)) * 3 for i in range(4)]
+            + [None],
+            dtype=object,
+        )[:-1],
+    )
+
+
+mbtr_2 = {
+    "start": 0,
+    "stop": 1,
+    "num": 5,
+    "geomf": "1/distance",
+    "weightf": "unity",
+    "broadening": 0.01,
+    "acc": 0.001,
+}
+
+
+def components(context):
+    sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+
+    yield SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, context=context)
+    yield SymmetryFunctions(
+        [1, 2], sfs=sfs, cutoff=5.0, stratify=False, context=context
+    )
+    yield SymmetryFunctions(
+        [1, 2], sfs=sfs, cutoff=5.0, stratify="elements", context=context
+    )
+    yield SymmetryFunctions([1, 2], sfs=sfs, cutoff=5.0, sparse=True, context=context)
+    yield MBTR(elems=[1, 2], mbtr_2=mbtr_2, context=context)
+    yield LMBTR(elems=[1, 2], mbtr_2=mbtr_2, context=context)
+    yield SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context=context)
+    yield AverageSOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context=context)
+
+
+def is_sparse(rep):
+    return hasattr(rep, "data") and hasattr(rep.data, "toarray")
+
+
+class TestChunking(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_chunked(self):
+        reference = [c.compute(self.data) for c in components({})]
+
+        for context in [{"chunk_size": 2}, {"chunk_bytes": 400}]:
+            for expected, component in zip(reference, components(context)):
+                computed = component.compute(self.data)
+                if is_sparse(expected):
+                    assert_same(
+                        [x.toarray() for x in computed], [x.toarray() for x in expected]
+                    )
+                else:
+                    assert_same(computed, expected)
+
+    def test_compute_iter(self):
+        sf = SymmetryFunctions(
+            [1, 2], sfs=[{"rad": {"eta": 0.5, "mu": 0.0}}], cutoff=5.0
+        )
+
+        chunks = list(sf.compute_iter(self.data, chunk_size=3))
+        self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+
+        full = sf.compute(self.data)
+        assert_same(chunks[1][0], full[3])
+
+
+class TestData(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_call(self):
+        from cmlkit.representation.data import (
+            AtomicRepresentation,
+            GlobalRepresentation,
+        )
+
+        for context in [{}, {"chunk_size": 3}, {"chunk_bytes": 400}]:
+            for component in components(context):
+                expected = component.compute(self.data)
+                result = component(self.data)
+
+                if hasattr(expected, "blocks"):
+                    assert_same(result, expected)
+                elif isinstance(expected, Ragged):
+                    self.assertIsInstance(result, AtomicRepresentation)
+                    np.testing.assert_array_equal(result.counts, expected.counts)
+                    if is_sparse(expected):
+                        np.testing.assert_array_equal(
+                            result.linear.toarray(), expected.data.toarray()
+                        )
+                    else:
+                        np.testing.assert_array_equal(result.linear, expected.data)
+                else:
+                    self.assertIsInstance(result, GlobalRepresentation)
+                    np.testing.assert_array_equal(result.array, expected)
+
+    def test_centers(self):
+        sf = SymmetryFunctions(
+            [1, 2], sfs=[{"rad": {"eta": 0.5, "mu": 0.0}}], cutoff=5.0, centers=[1]
+        )
+
+        # rows per system are the number of hydrogens, not atoms
+        counts = [int(np.sum(z == 1)) for z in self.data.z]
+
+        result = sf(self.data)
+        self.assertEqual(list(result.counts), counts)
+        self.assertEqual(result.linear.shape[0], sum(counts))
+
+
+class TestOutput(TestCase):
+    def setUp(self):
+        self.data = make_data()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_output(self):
+        reference = [c.compute(self.data) for c in components({})]
+
+        for i, (expected, component) in enumerate(
+            zip(reference, components({"chunk_size": 3}))
+        ):
+            directory = f"{self.tmpdir}/{i}"
+            component.context["output"] = directory
+
+            computed = component.compute(self.data)
+            loaded = storage.load(
+                component._output_directory(self.data, directory), mmap_mode="r"
+            )
+
+            if is_sparse(expected):
+                continue
+
+            if isinstance(expected, np.ndarray):
+                self.assertIsInstance(computed, np.memmap)
+            elif hasattr(expected, "offsets"):
+                self.assertIsInstance(computed.data, np.memmap)
+
+            assert_same(computed, expected)
+            assert_same(loaded, expected)
+
+    def test_two_datasets(self):
+        first = Subset.from_dataset(self.data, idx=np.arange(4))
+        second = Subset.from_dataset(self.data, idx=np.arange(4, self.data.n))
+
+        # all components and both datasets share one output directory
+        reference = [c.compute(first) for c in components({})]
+        computed = [c.compute(first) for c in components({"output": self.tmpdir})]
+        others = [c.compute(second) for c in components({"output": self.tmpdir})]
+
+        for expected, result, other in zip(reference, computed, others):
+            self.assertEqual(len(other), second.n)
+
+            if is_sparse(expected):
+                continue
+
+            # computing the second dataset leaves the first one intact
+            assert_same(result, expected)
+
+        # computing again loads the stored result
+        for expected, component in zip(
+            reference, components({"output": self.tmpdir, "profile": True})
+        ):
+            again = component.compute(first)
+            self.assertNotIn("create", component.stats)
+
+            if not is_sparse(expected):
+                assert_same(again, expected)
+
+
+class TestEstimate(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_estimate(self):
+        for component in components({}):
+            computed = component.compute(self.data)
+            estimate = component.estimate(self.data)
+
+            self.assertEqual(
+                estimate, component.estimate(self.data.info["atoms_by_system"])
+            )
+
+            if is_sparse(computed):
+                self.assertEqual(computed.data.shape[1], estimate["dim"])
+                continue
+
+            if isinstance(computed, np.ndarray):
+                dense = computed
+            elif hasattr(computed, "blocks"):
+                dense = np.concatenate([computed[e] for e in computed.elems])
+            else:
+                dense = computed.data
+
+            self.assertEqual(dense.shape, (estimate["n_rows"], estimate["dim"]))
+            self.assertEqual(dense.nbytes, estimate["bytes"])
+            self.assertGreater(estimate["seconds"], 0)
+
+    def test_columns_and_projection(self):
+        for component in components({}):
+            pruned = component.pruned(self.data, tol=1e-3)
+            projected = component.projected(self.data, dim=3)
+
+            for variant in [pruned, projected]:
+                estimate = variant.estimate(self.data)
+                flat = variant._transform(variant._create(self.data))
+                n_rows, dim = flat.shape
+
+                self.assertEqual(estimate["n_rows"], n_rows)
+                self.assertEqual(estimate["raw_dim"], component._raw_dim())
+                self.assertEqual(
+                    estimate["bytes_flat"], flat.dtype.itemsize * n_rows * dim
+                )
+
+                if variant.local:
+                    self.assertEqual(estimate["bytes_stratified"], 8 * n_rows * dim * 2)
+
+    def test_max_bytes(self):
+        sf = SymmetryFunctions(
+            [1, 2],
+            sfs=[{"rad": {"eta": 0.5, "mu": 0.0}}],
+            cutoff=5.0,
+            context={"max_bytes": 100},
+        )
+
+        with self.assertRaises(MemoryError):
+            sf.compute(self.data)
+
+        sf.context["max_bytes"] = sf.estimate(self.data)["bytes"]
+        sf.compute(self.data)
+
+
+class TestDtype(TestCase):
+    def setUp(self):
+        self.data = make_data()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_dtype(self):
+        reference = [c.compute(self.data) for c in components({})]
+
+        for context in [
+            {"dtype": "float32"},
+            {"dtype": "float32", "engine": "shared", "n_jobs": 2},
+            {"dtype": "float32", "cache": self.tmpdir},
+        ]:
+            for expected, component in zip(reference, components(context)):
+                computed = component.compute(self.data)
+                estimate = component.estimate(self.data)
+
+                if is_sparse(computed):
+                    self.assertEqual(computed.data.dtype, np.float32)
+                    continue
+
+                if isinstance(computed, np.ndarray):
+                    dense = computed
+                elif hasattr(computed, "blocks"):
+                    dense = np.concatenate([computed[e] for e in computed.elems])
+                else:
+                    dense = computed.data
+
+                self.assertEqual(dense.dtype, np.float32)
+                self.assertEqual(dense.nbytes, estimate["bytes"])
+
+                if isinstance(expected, np.ndarray):
+                    np.testing.assert_allclose(computed, expected, rtol=1e-6)
+                elif hasattr(expected, "blocks"):
+                    for e in expected.elems:
+                        np.testing.assert_allclose(computed[e], expected[e], rtol=1e-6)
+                else:
+                    for x, y in zip(computed, expected):
+                        np.testing.assert_allclose(x, y, rtol=1e-6)
+
+    def test_invalid_dtype(self):
+        with self.assertRaises(ValueError):
+            SOAP(
+                [1], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context={"dtype": "int32"}
+            )
+
+
+class TestInput(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_input(self):
+        periodic = Dataset(
+            z=self.data.z, r=self.data.r, b=np.array([np.eye(3) * 4.0] * self.data.n)
+        )
+
+        for data in [self.data, periodic]:
+            for context in [{}, {"neighbour_cache": True}]:
+                reference = [
+                    c.compute(data) for c in components({"input": "ase", **context})
+                ]
+
+                for expected, component in zip(reference, components(context)):
+                    computed = component.compute(data)
+                    if is_sparse(expected):
+                        assert_same(
+                            [x.toarray() for x in computed],
+                            [x.toarray() for x in expected],
+                        )
+                    else:
+                        assert_same(computed, expected)
+
+    def test_unknown_input(self):
+        with self.assertRaises(ValueError):
+            SOAP([1], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context={"input": "x"})
+
+
+class TestProjection(TestCase):
+    def setUp(self):
+        self.data = make_data()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_random(self):
+        from cscribe import projection
+
+        for component in components({}):
+            projected = component.projected(self.data, dim=3, seed=1)
+            config = projected._get_config()["projection"]
+            matrix = projection.get(config).matrix
+
+            self.assertEqual(matrix.shape, (component._raw_dim(), 3))
+            self.assertEqual(projected.estimate(self.data)["dim"] % 3, 0)
+
+            raw = component._create(self.data)
+            expected = raw @ matrix.astype(raw.dtype)
+            if sp.issparse(expected):
+                expected = expected.toarray()
+            np.testing.assert_allclose(projected._transform(raw), expected)
+
+            # works through the whole pipeline, chunk by chunk
+            chunked = type(projected)(
+                **projected._get_config(), context={"chunk_size": 3}
+            )
+            rep = chunked.compute(self.data)
+            if isinstance(rep, np.ndarray):
+                self.assertEqual(rep.shape[1], 3)
+
+            with self.assertRaises(ValueError):
+                projected.projected(self.data, dim=2)
+
+    def test_chunked(self):
+        from unittest import mock
+
+        for component in components({}):
+            projected = component.projected(self.data, dim=3, seed=1)
+            limit = 4 * projected._chunk_row_bytes()
+
+            rows = []
+            create = projected._create
+
+            def recording(data):
+                rep = create(data)
+                rows.append((data.n, rep.shape[0]))
+                return rep
+
+            projected._create = recording
+
+            # projected output is chunked even if chunking is not configured
+            with mock.patch("cscribe.representation.CHUNK_BYTES", limit):
+                projected.compute(self.data)
+
+            self.assertGreater(len(rows), 1)
+            for n, n_rows in rows:
+                if n > 1:
+                    self.assertLessEqual(n_rows * projected._chunk_row_bytes(), limit)
+
+    def test_pca(self):
+        soap = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+        path = f"{self.tmpdir}/soap_pca"
+        projected = soap.projected(self.data, dim=2, method="pca", path=path)
+
+        raw = soap._create(self.data).astype(np.float64)
+        centered = raw - raw.mean(axis=0)
+        _, s, vt = np.linalg.svd(centered, full_matrices=False)
+
+        computed = projected.compute(self.data)
+        flat = np.concatenate([computed[i] for i in range(self.data.n)])
+        expected = centered @ vt[:2].T
+
+        # components are determined up to sign
+        np.testing.assert_allclose(
+            np.abs(flat), np.abs(expected), rtol=1e-3, atol=1e-4 * s[0]
+        )
+
+        # the config is enough to restore the projection
+        restored = SOAP(**projected._get_config())
+        for a, b in zip(restored.compute(self.data), computed):
+            np.testing.assert_array_equal(a, b)
+
+        with self.assertRaises(ValueError):
+            soap.projected(self.data, dim=2, method="pca")
+
+
+class TestAverageSOAP(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_average(self):
+        soap = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+        average = AverageSOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+
+        full = soap.compute(self.data)
+        computed = average.compute(self.data)
+
+        self.assertEqual(computed.shape, (self.data.n, soap._raw_dim()))
+        for i in range(self.data.n):
+            np.testing.assert_allclose(computed[i], full[i].mean(axis=0), rtol=1e-5)
+
+        with self.assertRaises(ValueError):
+            AverageSOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, average="x")
+
+
+class TestCenters(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_centers(self):
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+
+        def local_components(centers, context={}):
+            yield SymmetryFunctions(
+                [1, 2], sfs=sfs, cutoff=5.0, centers=centers, context=context
+            )
+            yield SymmetryFunctions(
+                [1, 2],
+                sfs=sfs,
+                cutoff=5.0,
+                stratify="elements",
+                centers=centers,
+                context=context,
+            )
+            yield LMBTR(elems=[1, 2], mbtr_2=mbtr_2, centers=centers, context=context)
+            yield SOAP(
+                [1, 2],
+                cutoff=3.0,
+                sigma=0.5,
+                n_max=2,
+                l_max=2,
+                centers=centers,
+                context=context,
+            )
+
+        # first system has no centers
+        selected = [np.array([], dtype=int)] + [
+            np.array([len(z) - 1]) for z in self.data.z[1:]
+        ]
+        self.data.p["selected"] = np.empty(self.data.n, dtype=object)
+        self.data.p["selected"][:] = selected
+
+        reference = list(local_components(None))
+        for context in [{}, {"chunk_size": 3}, {"engine": "shared", "n_jobs": 2}]:
+            for centers in [[2], "selected"]:
+                for full, component in zip(
+                    reference, local_components(centers, context=context)
+                ):
+                    idx = component._centers(self.data)
+                    expected = full.compute(self.data)
+                    computed = component.compute(self.data)
+
+                    self.assertEqual(
+                        component.estimate(self.data)["n_rows"],
+                        sum(len(i) for i in idx),
+                    )
+
+                    if hasattr(expected, "blocks"):
+                        for e in expected.elems:
+                            keep = [
+                                j
+                                for j, (s, a) in enumerate(
+                                    zip(expected.system[e], expected.atom[e])
+                                )
+                                if a in idx[s]
+                            ]
+                            np.testing.assert_allclose(
+                                computed[e], expected[e][keep], rtol=1e-6
+                            )
+                            np.testing.assert_array_equal(
+                                computed.atom[e], expected.atom[e][keep]
+                            )
+                    else:
+                        for i in range(self.data.n):
+                            self.assertEqual(len(computed[i]), len(idx[i]))
+                            np.testing.assert_allclose(
+                                computed[i], expected[i][idx[i]], rtol=1e-6
+                            )
+
+
+class TestProfile(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_profile(self):
+        for component in components({"profile": True, "chunk_size": 3}):
+            component.compute(self.data)
+            stats = component.stats
+
+            for stage in ["atoms", "descriptor", "create", "arrange", "compute"]:
+                self.assertIn(stage, stats)
+
+            if component.local:
+                self.assertEqual(stats["to_local"]["calls"], 3)
+                self.assertGreaterEqual(
+                    stats["arrange"]["seconds"], stats["to_local"]["seconds"]
+                )
+
+            self.assertEqual(stats["compute"]["calls"], 1)
+            self.assertEqual(stats["create"]["calls"], 3)
+            self.assertGreater(stats["create"]["bytes"], 0)
+            self.assertGreaterEqual(
+                stats["compute"]["seconds"], stats["create"]["seconds"]
+            )
+
+    def test_callback(self):
+        calls = []
+        soap = SOAP(
+            [1, 2],
+            cutoff=3.0,
+            sigma=0.5,
+            n_max=2,
+            l_max=2,
+            context={"profile": lambda stage, m: calls.append((stage, m))},
+        )
+        soap.compute(self.data)
+
+        self.assertEqual([c[0] for c in calls][-1], "compute")
+        self.assertEqual(len(calls), sum(s["calls"] for s in soap.stats.values()))
+
+    def test_disabled(self):
+        soap = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+        soap.compute(self.data)
+
+        self.assertEqual(soap.stats, {})
+
+
+class TestParallel(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_shared(self):
+        reference = [c.compute(self.data) for c in components({})]
+
+        for expected, component in zip(
+            reference, components({"engine": "shared", "n_jobs": 3})
+        ):
+            computed = component.compute(self.data)
+            if is_sparse(expected):
+                assert_same(
+                    [x.toarray() for x in computed], [x.toarray() for x in expected]
+                )
+            else:
+                assert_same(computed, expected)
+
+        soap = SOAP(
+            [1, 2],
+            cutoff=3.0,
+            sigma=0.5,
+            n_max=2,
+            l_max=2,
+            context={"engine": "shared", "n_jobs": 2},
+        )
+        self.assertIsInstance(soap.compute(self.data).data, np.memmap)
+
+    def test_dscribe(self):
+        reference = [c.compute(self.data) for c in components({})]
+
+        # systems are reordered by cost before dscribe splits them up
+        for expected, component in zip(reference, components({"n_jobs": 2})):
+            computed = component.compute(self.data)
+            if is_sparse(expected):
+                assert_same(
+                    [x.toarray() for x in computed], [x.toarray() for x in expected]
+                )
+            else:
+                assert_same(computed, expected)
+
+    def test_shared_dir(self):
+        from unittest import mock
+        from cscribe import parallel
+
+        tmp = tempfile.gettempdir()
+
+        with mock.patch("cscribe.parallel._free_bytes", return_value=2**20):
+            self.assertIn(parallel._shared_dir(2**10), ["/dev/shm", tmp])
+
+            # falls back to the temporary directory, or gives up
+            free = {"/dev/shm": 0, tmp: 2**20}
+            with mock.patch("cscribe.parallel._free_bytes", side_effect=free.get):
+                self.assertEqual(parallel._shared_dir(2**10), tmp)
+
+            with self.assertRaises(MemoryError):
+                parallel._shared_dir(2**30)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            SOAP([1], cutoff=3.0, sigma=0.5, n_max=2, l_max=2, context={"engine": "x"})
+
+    def test_auto_n_jobs(self):
+        from cscribe.parallel import auto_n_jobs
+
+        self.assertEqual(auto_n_jobs(0.01, 100, cores=8), 1)
+        self.assertEqual(auto_n_jobs(1000.0, 100, cores=8), 8)
+        self.assertEqual(auto_n_jobs(1000.0, 3, cores=8), 3)
+        self.assertEqual(auto_n_jobs(2.5, 100, cores=8), 2)
+
+        reference = [c.compute(self.data) for c in components({})]
+        for expected, component in zip(reference, components({"n_jobs": "auto"})):
+            computed = component.compute(self.data)
+            if not is_sparse(expected):
+                assert_same(computed, expected)
+
+            self.assertEqual(component.chosen_n_jobs, 1)
+
+
+class TestPruning(TestCase):
+    def setUp(self):
+        self.data = make_data()
+
+    def test_pruned(self):
+        for component in components({}):
+            pruned = component.pruned(self.data)
+            columns = pruned._get_config()["columns"]
+
+            self.assertLessEqual(len(columns), component._raw_dim())
+            self.assertEqual(type(pruned), type(component))
+
+            expected = component._create(self.data)[:, columns]
+            computed = pruned._create(self.data)
+            computed = pruned._select_columns(computed)
+            if sp.issparse(computed):
+                computed, expected = computed.toarray(), expected.toarray()
+
+            np.testing.assert_array_equal(computed, expected)
+
+            # the full pipeline respects the columns
+            estimate = pruned.estimate(self.data)
+            rep = pruned.compute(self.data)
+            if isinstance(rep, np.ndarray):
+                self.assertEqual(rep.shape[1], estimate["dim"])
+            elif hasattr(rep, "blocks"):
+                self.assertEqual(rep.dim, estimate["dim"])
+            else:
+                self.assertEqual(rep.data.shape[1], estimate["dim"])
+
+    def test_new_data(self):
+        soap = SOAP([1, 2], cutoff=3.0, sigma=0.5, n_max=2, l_max=2)
+        pruned = soap.pruned(Subset.from_dataset(self.data, idx=[1]))
+
+        full = soap.compute(self.data)
+        computed = pruned.compute(self.data)
+        columns = pruned.config["columns"]
+        self.assertLess(len(columns), soap._raw_dim())
+
+        for a, b in zip(computed, full):
+            np.testing.assert_array_equal(a, b[:, columns])
@@ -0,0 +1,54 @@
+from unittest import TestCase
+import numpy as np
+
+from cmlkit import Dataset
+
+from cscribe import schedule
+
+
+class TestSchedule(TestCase):
+    def test_costs(self):
+        data = Dataset(
+            z=np.array([np.array([1, 1]), np.array([1, 1, 1])], dtype=object),
+            r=np.array(
+                [
+                    np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0]]),
+                    np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 0.0, 5.0]]),
+                ],
+                dtype=object,
+            ),
+        )
+
+        np.testing.assert_array_equal(schedule.costs(data, cutoff=2.0), [4, 5])
+        np.testing.assert_array_equal(schedule.costs(data), [4, 9])
+
+    def test_tasks(self):
+        costs = np.array([1, 1, 1, 1, 100, 1, 1, 1, 50])
+        tasks = schedule.tasks(costs, n_jobs=2)
+
+        np.testing.assert_array_equal(tasks[0], [4])
+        np.testing.assert_array_equal(tasks[1], [8])
+        np.testing.assert_array_equal(np.sort(np.concatenate(tasks)), np.arange(9))
+
+    def test_order(self):
+        costs = np.array([100, 90, 1, 1, 1, 1, 1, 1, 1])
+        order = schedule.order(costs, n_jobs=2)
+
+        np.testing.assert_array_equal(np.sort(order), np.arange(9))
+
+        # dscribe gives the first job 5 systems and the second one 4
+        first, second = order[:5], order[5:]
+        self.assertEqual(costs[first].sum(), 104)
+        self.assertEqual(costs[second].sum(), 93)
+
+    def test_costs_periodic(self):
+        data = Dataset(
+            z=np.array([[1, 1]]),
+            r=np.array([[[0.0, 0.0, 0.0], [0.0, 0.0, 1.0]]]),
+            b=np.array([np.eye(3) * 2.0]),
+        )
+
+        # 2 atoms in a cell of volume 8, so 2 / 8 * 4/3 pi neighbours each
+        np.testing.assert_allclose(
+            schedule.costs(data, cutoff=1.0), [2 + 2 * 2 / 8 * 4 / 3 * np.pi]
+        )
@@ -6,7 +6,7 @@ import pathlib
 
 from cmlkit import Dataset
 
-from cscribe.sf import SymmetryFunctions
+from cscribe.sf import SymmetryFunctions, compute_batch
 
 
 def fc(r, cutoff):
@@ -41,7 +41,7 @@ class TestSymmetryFunctions(TestCase):
                 elems=[1], cutoff=cutoff, sfs=[{"rad": {"eta": eta, "mu": mu}}]
             )
 
-            computed = sf(data)
+            computed = sf.compute(data)
 
             print(computed.shape)
 
@@ -75,7 +75,7 @@ class TestSymmetryFunctions(TestCase):
                 elems=[1], cutoff=cutoff, sfs=[{"rad": {"eta": eta, "mu": mu}}]
             )
 
-            computed = sf(data)
+            computed = sf.compute(data)
 
             print(computed.shape)
 
@@ -102,7 +102,7 @@ class TestSymmetryFunctions(TestCase):
 
         delta = (cutoff - 1.5) / 2
 
-        computed = sf(data)
+        computed = sf.compute(data)
         print(computed)
 
         np.testing.assert_almost_equal(computed[0][0][0], fc(2.0, cutoff))
@@ -141,7 +141,7 @@ class TestSymmetryFunctions(TestCase):
                 cutoff=cutoff,
             )
 
-            computed = sf(data)
+            computed = sf.compute(data)
 
             print(computed)
 
@@ -184,7 +184,7 @@ class TestSymmetryFunctions(TestCase):
                 [1, 2, 3], sfs=[{"rad": {"eta": eta, "mu": mu}}], cutoff=cutoff
             )
 
-            computed = sf(data)
+            computed = sf.compute(data)
 
             print(computed)
             print(computed.shape)
@@ -248,3 +248,98 @@ class TestSymmetryFunctions(TestCase):
             # Other Z = 3
             np.testing.assert_almost_equal(computed[0][2][12 + 4], 0.0)
             np.testing.assert_almost_equal(computed[0][2][12 + 5], 0.0)
+
+    def test_sparse(self):
+
+        data = Dataset(
+            z=np.array([[1, 2, 3], [3, 3, 1]]),
+            r=np.array(
+                [
+                    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                    [[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0]],
+                ]
+            ),
+        )
+
+        sfs = [
+            {"rad": {"eta": 0.5, "mu": 0.0}},
+            {"ang": {"eta": 0.1, "zeta": 1.0, "lambd": 1.0}},
+        ]
+
+        for stratify in [True, False]:
+            dense = SymmetryFunctions(
+                [1, 2, 3], sfs=sfs, cutoff=5.0, stratify=stratify
+            ).compute(data)
+            sparse = SymmetryFunctions(
+                [1, 2, 3], sfs=sfs, cutoff=5.0, stratify=stratify, sparse=True
+            ).compute(data)
+
+            for i in range(2):
+                np.testing.assert_allclose(sparse[i].toarray(), dense[i], rtol=1e-6)
+
+    def test_stratify_by_element(self):
+
+        data = Dataset(
+            z=np.array([[1, 2, 1], [2, 2, 1]]),
+            r=np.array(
+                [
+                    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                    [[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0]],
+                ]
+            ),
+        )
+
+        sfs = [{"rad": {"eta": 0.5, "mu": 0.0}}]
+
+        blocks = SymmetryFunctions(
+            [1, 2], sfs=sfs, cutoff=5.0, stratify=True
+        ).compute(data)
+        computed = SymmetryFunctions(
+            [1, 2], sfs=sfs, cutoff=5.0, stratify="elements"
+        ).compute(data)
+
+        dim = computed.dim
+        self.assertEqual(blocks.dim, 2 * dim)
+
+        for i, elem in enumerate([1, 2]):
+            for row, (system, atom) in enumerate(
+                zip(computed.system[elem], computed.atom[elem])
+            ):
+                np.testing.assert_array_equal(
+                    computed[elem][row],
+                    blocks[system][atom][i * dim : (i + 1) * dim],
+                )
+
+    def test_compute_batch(self):
+
+        data = Dataset(
+            z=np.array([[1, 2, 1], [2, 2, 1]]),
+            r=np.array(
+                [
+                    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                    [[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0]],
+                ]
+            ),
+        )
+
+        rad = {"rad": {"eta": 0.5, "mu": 0.0}}
+        ang = {"ang": {"eta": 0.1, "zeta": 1.0, "lambd": 1.0}}
+        other_ang = {"ang": {"eta": 0.2, "zeta": 2.0, "lambd": -1.0}}
+
+        components = [
+            SymmetryFunctions([1, 2], sfs=[rad], cutoff=5.0),
+            SymmetryFunctions([1, 2], sfs=[other_ang, rad, ang], cutoff=5.0),
+            SymmetryFunctions(
+                [1, 2], sfs=[{"rad_shifted": {"n": 3}}, ang], cutoff=5.0, stratify=False
+            ),
+        ]
+
+        computed = compute_batch(data, components)
+
+        for c, rep in zip(components, computed):
+            expected = c.compute(data)
+            for i in range(2):
+                np.testing.assert_array_equal(rep[i], expected[i])
+
+        with self.assertRaises(ValueError):
+            compute_batch(data, [components[0], SymmetryFunctions([1, 2], cutoff=4.0)])